@@ -0,0 +1,129 @@
+import bcfetch from 'bandcamp-fetch';
+import fs from 'fs';
+import readline from 'readline';
+
+// long-lived worker, JSON lines on stdin/stdout:
+//   in:  {"id": "...", "cmd": "wishlist", "cookie": "..."}
+//   out: {"id": "...", "type": "album", "url": "...", "tracks": [...]}
+//        {"id": "...", "type": "done", "albums": n, "cached": n}
+//        {"id": "...", "type": "error", "message": "..."}
+
+const CONCURRENCY = parseInt(process.env.BC_CONCURRENCY || '4', 10)
+const CACHE_PATH = process.env.BC_CACHE_PATH || './bandcamp_cache.jsonl'
+
+// album url -> tracklist, append-only so a crash never loses earlier entries
+const loadCache = () => {
+    const cache = new Map()
+    if (!fs.existsSync(CACHE_PATH)) {
+        return cache
+    }
+    for (const line of fs.readFileSync(CACHE_PATH, 'utf-8').split('\n')) {
+        if (!line.trim()) {
+            continue
+        }
+        try {
+            const entry = JSON.parse(line)
+            cache.set(entry.url, entry.tracks)
+        } catch (e) {
+            // truncated last line after a crash
+        }
+    }
+    return cache
+}
+
+const cache = loadCache()
+
+const send = (message) => {
+    process.stdout.write(JSON.stringify(message) + '\n')
+}
+
+const getAlbumTracklist = async (albumUrl) => {
+    const params = {albumUrl: albumUrl}
+    const album = bcfetch.album
+    const info = await album.getInfo(params)
+    const filteredTracks = []
+    info.tracks.forEach((track) => {
+        filteredTracks.push({
+            title: track.name,
+            artist: info.artist.name,
+            album: info.name,
+            duration_ms: Math.round((track.duration || 0) * 1000)
+        })
+    })
+    return filteredTracks
+}
+
+const getWishlistUrls = async () => {
+    const fan = bcfetch.fan
+    const urls = []
+    let result = await fan.getWishlist()
+    urls.push(...result.items.map((item) => item.url))
+    while (result.continuation) {
+        result = await fan.getWishlist({ target: result.continuation })
+        urls.push(...result.items.map((item) => item.url))
+    }
+    return urls
+}
+
+const fetchWishlist = async (id, cookie) => {
+    bcfetch.setCookie(cookie.toString())
+    const urls = await getWishlistUrls()
+
+    let cached = 0
+    const pending = []
+    for (const url of urls) {
+        if (cache.has(url)) {
+            cached++
+            send({ id, type: 'album', url, tracks: cache.get(url) })
+        } else {
+            pending.push(url)
+        }
+    }
+
+    // bounded pool instead of firing every album request at once
+    const worker = async () => {
+        while (pending.length > 0) {
+            const url = pending.shift()
+            try {
+                const tracks = await getAlbumTracklist(url)
+                cache.set(url, tracks)
+                fs.appendFileSync(CACHE_PATH, JSON.stringify({ url, tracks }) + '\n')
+                send({ id, type: 'album', url, tracks })
+            } catch (e) {
+                process.stderr.write(`album fetch error ${url}: ${e}\n`)
+            }
+        }
+    }
+    await Promise.all(Array.from({ length: CONCURRENCY }, worker))
+
+    send({ id, type: 'done', albums: urls.length, cached })
+}
+
+// commands are handled one at a time: setCookie is global to bandcamp-fetch
+let queue = Promise.resolve()
+
+const rl = readline.createInterface({ input: process.stdin })
+rl.on('line', (line) => {
+    if (!line.trim()) {
+        return
+    }
+    let request
+    try {
+        request = JSON.parse(line)
+    } catch (e) {
+        send({ id: null, type: 'error', message: `invalid request: ${e}` })
+        return
+    }
+
+    queue = queue.then(async () => {
+        try {
+            if (request.cmd === 'wishlist') {
+                await fetchWishlist(request.id, request.cookie)
+            } else {
+                send({ id: request.id, type: 'error', message: `unknown command: ${request.cmd}` })
+            }
+        } catch (e) {
+            send({ id: request.id, type: 'error', message: `${e}` })
+        }
+    })
+})
@@ -0,0 +1,258 @@
+"""Faux slskd (api v0) pour mesurer le pipeline sans toucher au réseau soulseek.
+
+    python -m bench.fake_slskd --port 5031 --search-latency 0.5 --responses 20
+
+Les réponses et les transferts sont déterministes pour une graine et un texte de recherche donnés.
+"""
+import argparse
+import hashlib
+import random
+import time
+import uuid
+from collections import Counter
+
+from aiohttp import web
+
+API = '/api/v0'
+
+
+class FakeSlskd:
+    def __init__(self, search_latency: float = 0.5, responses: int = 20, files_per_response: int = 3,
+                 peer_failure_rate: float = 0.1, transfer_speed: int = 2_000_000,
+                 queue_wait: float = 0.2, file_size: int = 8_000_000, length: int = 240, seed: int = 0):
+        self.search_latency = search_latency
+        self.responses = responses
+        self.files_per_response = files_per_response
+        self.peer_failure_rate = peer_failure_rate
+        self.transfer_speed = transfer_speed
+        self.queue_wait = queue_wait
+        self.file_size = file_size
+        self.length = length
+        self.seed = seed
+        self.searches = {}
+        self.transfers = {}
+        self.calls = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._count])
+        app.add_routes([
+            web.get(f'{API}/application', self.application),
+            web.get(f'{API}/application/version', self.version),
+            web.get(f'{API}/server', self.server),
+            web.put(f'{API}/server', self.server),
+            web.post(f'{API}/searches', self.create_search),
+            web.get(f'{API}/searches/{{id}}', self.search_state),
+            web.put(f'{API}/searches/{{id}}', self.stop_search),
+            web.delete(f'{API}/searches/{{id}}', self.delete_search),
+            web.get(f'{API}/searches/{{id}}/responses', self.search_responses),
+            web.get(f'{API}/transfers/downloads/', self.downloads),
+            web.post(f'{API}/transfers/downloads/{{username}}', self.enqueue),
+            web.delete(f'{API}/transfers/downloads/{{username}}/{{id}}', self.cancel),
+            web.get('/bench/stats', self.stats),
+            web.post('/bench/reset', self.reset),
+        ])
+        return app
+
+    @web.middleware
+    async def _count(self, request, handler):
+        if request.path.startswith(API):
+            self.calls[f"{request.method} {request.match_info.route.resource.canonical}"] += 1
+        return await handler(request)
+
+    # application / server
+
+    async def application(self, request):
+        return web.json_response({'version': {'current': 'fake'}, 'server': {'state': 'Connected, LoggedIn'}})
+
+    async def version(self, request):
+        return web.json_response('fake')
+
+    async def server(self, request):
+        if request.method == 'PUT':
+            return web.Response(status=204)
+        return web.json_response({'state': 'Connected, LoggedIn', 'isConnected': True, 'isLoggedIn': True})
+
+    # searches
+
+    async def create_search(self, request):
+        body = await request.json()
+        search = {
+            'id': body.get('id') or str(uuid.uuid4()),
+            'searchText': body['searchText'],
+            'started': time.monotonic(),
+            'stopped': False,
+            'responses': self._responses(body['searchText']),
+        }
+        self.searches[search['id']] = search
+        return web.json_response({'id': search['id'], 'searchText': search['searchText'], 'state': 'InProgress'})
+
+    async def search_state(self, request):
+        search = self._search(request)
+        count = self._response_count(search)
+        done = search['stopped'] or count == len(search['responses'])
+        return web.json_response({
+            'id': search['id'],
+            'searchText': search['searchText'],
+            'state': 'Completed, Succeeded' if done else 'InProgress',
+            'responseCount': count,
+            'fileCount': count * self.files_per_response,
+        })
+
+    async def search_responses(self, request):
+        search = self._search(request)
+        return web.json_response(search['responses'][:self._response_count(search)])
+
+    async def stop_search(self, request):
+        self._search(request)['stopped'] = True
+        return web.Response(status=204)
+
+    async def delete_search(self, request):
+        self.searches.pop(request.match_info['id'], None)
+        return web.Response(status=204)
+
+    def _search(self, request) -> dict:
+        search = self.searches.get(request.match_info['id'])
+        if search is None:
+            raise web.HTTPNotFound()
+        return search
+
+    def _response_count(self, search: dict) -> int:
+        # les réponses arrivent régulièrement jusqu'à search_latency
+        if search['stopped']:
+            return search.get('final_count', len(search['responses']))
+        elapsed = time.monotonic() - search['started']
+        if elapsed >= self.search_latency:
+            count = len(search['responses'])
+        else:
+            count = int(len(search['responses']) * elapsed / self.search_latency)
+        search['final_count'] = count
+        return count
+
+    def _responses(self, text: str) -> list:
+        rng = self._rng(text)
+        responses = []
+        for i in range(self.responses):
+            username = f"peer{rng.randrange(10_000)}"
+            files = []
+            for j in range(self.files_per_response):
+                lossless = rng.random() < 0.3
+                files.append({
+                    'filename': f"@@music\\{username}\\{text}\\{j + 1:02d} - {text}.{'flac' if lossless else 'mp3'}",
+                    'size': self.file_size,
+                    'bitRate': None if lossless else rng.choice((128, 192, 256, 320, 320)),
+                    'length': self.length + rng.randint(-3, 3),
+                    'extension': 'flac' if lossless else 'mp3',
+                })
+            responses.append({
+                'username': username,
+                'files': files,
+                'fileCount': len(files),
+                'hasFreeUploadSlot': rng.random() < 0.7,
+                'queueLength': rng.randrange(20),
+                'uploadSpeed': rng.randrange(50_000, 5_000_000),
+            })
+        return responses
+
+    def _rng(self, text: str) -> random.Random:
+        digest = hashlib.sha1(f"{self.seed}:{text}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    # transfers
+
+    async def enqueue(self, request):
+        username = request.match_info['username']
+        enqueued = []
+        for file in await request.json():
+            failed = self._rng(f"{username}:{file['filename']}").random() < self.peer_failure_rate
+            transfer = {
+                'id': str(uuid.uuid4()),
+                'username': username,
+                'filename': file['filename'],
+                'size': file.get('size') or self.file_size,
+                'started': time.monotonic(),
+                'failed': failed,
+                'cancelled': False,
+            }
+            self.transfers[transfer['id']] = transfer
+            enqueued.append(self._transfer_view(transfer))
+        return web.json_response({'enqueued': enqueued, 'failed': []})
+
+    async def downloads(self, request):
+        users = {}
+        for transfer in self.transfers.values():
+            directory = transfer['filename'].rsplit('\\', 1)[0]
+            users.setdefault(transfer['username'], {}).setdefault(directory, []).append(self._transfer_view(transfer))
+        return web.json_response([
+            {'username': username, 'directories': [{'directory': d, 'files': files} for d, files in dirs.items()]}
+            for username, dirs in users.items()
+        ])
+
+    async def cancel(self, request):
+        transfer = self.transfers.get(request.match_info['id'])
+        if transfer is None:
+            raise web.HTTPNotFound()
+        transfer['cancelled'] = True
+        return web.Response(status=204)
+
+    def _transfer_view(self, transfer: dict) -> dict:
+        elapsed = time.monotonic() - transfer['started']
+        transferred = 0
+        if transfer['cancelled']:
+            state = 'Completed, Cancelled'
+        elif transfer['failed']:
+            state = 'Completed, Rejected' if elapsed > self.queue_wait else 'Queued, Remotely'
+        elif elapsed < self.queue_wait:
+            state = 'Queued, Remotely'
+        else:
+            transferred = min(transfer['size'], int((elapsed - self.queue_wait) * self.transfer_speed))
+            state = 'Completed, Succeeded' if transferred >= transfer['size'] else 'InProgress'
+        return {
+            'id': transfer['id'],
+            'username': transfer['username'],
+            'filename': transfer['filename'],
+            'size': transfer['size'],
+            'state': state,
+            'bytesTransferred': transferred,
+        }
+
+    # bench
+
+    async def stats(self, request):
+        return web.json_response({'calls': dict(self.calls), 'searches': len(self.searches),
+                                  'transfers': len(self.transfers)})
+
+    async def reset(self, request):
+        self.calls.clear()
+        self.searches.clear()
+        self.transfers.clear()
+        return web.Response(status=204)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="fake slskd api for benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5031)
+    parser.add_argument('--search-latency', type=float, default=0.5, help="seconds until every response is in")
+    parser.add_argument('--responses', type=int, default=20, help="responses per search")
+    parser.add_argument('--files-per-response', type=int, default=3)
+    parser.add_argument('--peer-failure-rate', type=float, default=0.1)
+    parser.add_argument('--transfer-speed', type=int, default=2_000_000, help="bytes per second")
+    parser.add_argument('--queue-wait', type=float, default=0.2, help="seconds queued before a transfer starts")
+    parser.add_argument('--file-size', type=int, default=8_000_000)
+    parser.add_argument('--length', type=int, default=240, help="track length in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def fake_from_args(args) -> FakeSlskd:
+    return FakeSlskd(
+        search_latency=args.search_latency, responses=args.responses,
+        files_per_response=args.files_per_response, peer_failure_rate=args.peer_failure_rate,
+        transfer_speed=args.transfer_speed, queue_wait=args.queue_wait, file_size=args.file_size,
+        length=args.length, seed=args.seed
+    )
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    web.run_app(fake_from_args(args).app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,171 @@
+"""Débit du pipeline de téléchargement contre le faux slskd.
+
+    python -m bench.run_bench --tracks 100,1000,10000 --search-latency 0.2 --json bench.json
+
+Le faux slskd tourne dans un process séparé pour que le RSS mesuré soit celui du client.
+Les options inconnues de ce script sont passées à bench.fake_slskd.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+# valeurs par défaut du bench, surchargeables par l'environnement
+BENCH_ENV = {
+    'SLSKD_API_KEY': 'bench',
+    'SOULSEEK_USERNAME': 'bench',
+    'SOULSEEK_PASSWORD': 'bench',
+    'SLSKD_PASSWORD': 'bench',
+    'SEARCHES_PER_MINUTE': '1000000',
+    'SEARCH_POLL_MIN': '0.05',
+    'TRANSFER_POLL_INTERVAL': '0.5',
+    'METRICS_SUMMARY': 'false',
+    'ALBUM_MODE': 'false',
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="download pipeline throughput benchmark")
+    parser.add_argument('--tracks', default='100,1000,10000', help="comma separated run sizes")
+    parser.add_argument('--port', type=int, default=0, help="fake slskd port (random when 0)")
+    parser.add_argument('--json', help="write the results to this file")
+    return parser.parse_known_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fake(port: int, fake_args: list) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, '-m', 'bench.fake_slskd', '--port', str(port), *fake_args])
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("fake slskd did not start")
+
+
+def synthetic_tracks(count: int) -> list:
+    return [{
+        'artist': f"Bench Artist {i % 500}",
+        'title': f"Synthetic Track {i}",
+        'album': f"Bench Album {i // 12}",
+        'duration_ms': 240_000,
+        'spotify_id': f"bench{i:08d}",
+    } for i in range(count)]
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def fake_call(base: str, method: str, path: str):
+    async with aiohttp.ClientSession() as session:
+        async with session.request(method, f"{base}{path}") as response:
+            return await response.json() if response.status == 200 else None
+
+
+async def run_size(downloader, base: str, count: int) -> dict:
+    await fake_call(base, 'POST', '/bench/reset')
+    tracks = synthetic_tracks(count)
+    submitted = {}
+
+    async def source():
+        for track in tracks:
+            submitted[track['spotify_id']] = time.perf_counter()
+            yield track
+
+    latencies = []
+    successful = 0
+    started = time.perf_counter()
+    async for result in downloader.stream_download(source(), source=f"bench {count}"):
+        successful += bool(result['success'])
+        track_id = result['track'].get('spotify_id')
+        if track_id in submitted:
+            latencies.append(time.perf_counter() - submitted[track_id])
+    elapsed = time.perf_counter() - started
+
+    stats = await fake_call(base, 'GET', '/bench/stats')
+    calls = sum(stats['calls'].values())
+    return {
+        'tracks': count,
+        'successful': successful,
+        'seconds': round(elapsed, 3),
+        'tracks_per_second': round(count / elapsed, 2),
+        'p50_latency': round(percentile(latencies, 0.5), 3),
+        'p99_latency': round(percentile(latencies, 0.99), 3),
+        # ru_maxrss est en Ko sous linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'calls_per_track': round(calls / count, 2),
+        'calls': stats['calls'],
+    }
+
+
+async def run(sizes: list, base: str) -> list:
+    # import tardif: Config lit l'environnement à l'import
+    from services.playlist_downloader import PlaylistDownloader
+
+    downloader = PlaylistDownloader()
+    results = []
+    try:
+        for count in sizes:
+            # base neuve par taille, sinon la bibliothèque saute les tracks déjà vues
+            downloader.library.db.execute("DELETE FROM tracks")
+            downloader.library.db.commit()
+            result = await run_size(downloader, base, count)
+            print(f"{count:>6} tracks  {result['tracks_per_second']:>8.2f} tracks/s  "
+                  f"p50 {result['p50_latency']:.2f}s  p99 {result['p99_latency']:.2f}s  "
+                  f"rss {result['peak_rss_mb']:.0f} MB  {result['calls_per_track']:.1f} calls/track  "
+                  f"({result['successful']} ok)")
+            results.append(result)
+    finally:
+        await downloader.close()
+    return results
+
+
+def main():
+    args, fake_args = parse_args()
+    sizes = [int(size) for size in args.tracks.split(',') if size]
+    port = args.port or free_port()
+    workdir = tempfile.mkdtemp(prefix='slsk-bench-')
+
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['SLSKD_HOST'] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault('LIBRARY_DB', os.path.join(workdir, 'library.db'))
+    os.environ.setdefault('JOURNAL_DB', os.path.join(workdir, 'jobs.db'))
+    os.environ.setdefault('PEER_DB', os.path.join(workdir, 'peers.db'))
+    os.environ.setdefault('DOWNLOAD_DIR', os.path.join(workdir, 'downloads'))
+
+    fake = start_fake(port, fake_args)
+    try:
+        results = asyncio.run(run(sizes, f"http://127.0.0.1:{port}"))
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'env': {k: os.environ[k] for k in BENCH_ENV}, 'fake_args': fake_args,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Coût de démarrage du CLI: détail -X importtime et temps mur de commandes courtes.
+
+    python -m bench.startup_bench --runs 5 --max-ms 300
+
+--max-ms fait échouer le script (code 1) si la médiane d'une commande dépasse le seuil, pour la CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    'import main': [sys.executable, '-c', 'import main'],
+    'main.py --help': [sys.executable, 'main.py', '--help'],
+    'main.py jobs': [sys.executable, 'main.py', 'jobs', '--limit', '1'],
+}
+
+
+def bench_env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault('JOURNAL_DB', os.path.join(workdir, 'jobs.db'))
+    env.setdefault('LOG_FILE', os.path.join(workdir, 'startup.log'))
+    return env
+
+
+def wall_clock(command: list, env: dict, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def import_breakdown(env: dict, top: int) -> list:
+    """Modules triés par temps cumulé (µs), lus sur stderr de python -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:   925 |   12401 |     re" (la première ligne est l'en-tête)
+        fields = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules.append({'module': fields[2].strip(), 'self_us': int(fields[0]), 'cumulative_us': int(fields[1])})
+    return sorted(modules, key=lambda m: m['cumulative_us'], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cli startup benchmark")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="modules shown in the import breakdown")
+    parser.add_argument('--max-ms', type=float, help="fail when a command median is above this")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    env = bench_env(tempfile.mkdtemp(prefix='slsk-startup-'))
+    results = {'commands': {}, 'imports': import_breakdown(env, args.top)}
+
+    print(f"{'module':<45}{'self ms':>10}{'cumul ms':>10}")
+    for module in results['imports']:
+        print(f"{module['module']:<45}{module['self_us'] / 1000:>10.1f}{module['cumulative_us'] / 1000:>10.1f}")
+    print()
+
+    failed = False
+    for name, command in COMMANDS.items():
+        timings = wall_clock(command, env, args.runs)
+        median = statistics.median(timings)
+        results['commands'][name] = {'median_ms': round(median, 1), 'min_ms': round(min(timings), 1)}
+        over = args.max_ms is not None and median > args.max_ms
+        failed |= over
+        print(f"{name:<25} median {median:>7.1f} ms  min {min(timings):>7.1f} ms{'  > max' if over else ''}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
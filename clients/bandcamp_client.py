@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import uuid
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class BandcampClient:
+    """Pilote un worker node (bc-worker.js) qui reste lancé entre deux synchros"""
+
+    def __init__(self, script: str = None):
+        self.script = script or Config.BANDCAMP_WORKER
+        self.process = None
+        self._reader = None
+        self._requests = {}
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self.process is not None and self.process.returncode is None:
+                return
+
+            self.process = await asyncio.create_subprocess_exec(
+                'node', self.script,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                limit=2 ** 20
+            )
+            self._reader = asyncio.create_task(self._read_loop())
+            logger.info(f"bandcamp worker started (pid {self.process.pid})")
+
+    async def close(self):
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self.process = None
+
+    async def iter_wishlist(self, cookie: str):
+        """Renvoie chaque album ({'url', 'tracks'}) dès que le worker l'a résolu ou lu dans son cache"""
+        await self.start()
+
+        request_id = str(uuid.uuid4())
+        messages = asyncio.Queue()
+        self._requests[request_id] = messages
+        try:
+            request = {'id': request_id, 'cmd': 'wishlist', 'cookie': cookie}
+            self.process.stdin.write((json.dumps(request) + '\n').encode('utf-8'))
+            await self.process.stdin.drain()
+
+            while True:
+                message = await messages.get()
+                if message['type'] == 'album':
+                    yield message
+                elif message['type'] == 'done':
+                    logger.info(f"bandcamp wishlist: {message['albums']} albums, {message['cached']} from cache")
+                    return
+                else:
+                    raise RuntimeError(f"bandcamp worker error: {message.get('message')}")
+        finally:
+            del self._requests[request_id]
+
+    async def _read_loop(self):
+        async for line in self.process.stdout:
+            line = line.decode('utf-8').strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f"bandcamp worker json parsing error: {e} - received output: {line[:200]}")
+                continue
+
+            queue = self._requests.get(message.get('id'))
+            if queue is not None:
+                queue.put_nowait(message)
+            elif message.get('type') == 'error':
+                logger.error(f"bandcamp worker error: {message.get('message')}")
+
+        # le worker s'est arrêté: on débloque les requêtes en cours
+        for queue in self._requests.values():
+            queue.put_nowait({'type': 'error', 'message': 'worker exited'})
@@ -0,0 +1,86 @@
+import os
+from config import Config
+from services.ranking import LOSSLESS_FORMATS
+
+
+class _Record:
+    """Accès façon dict (get, [], **) pour rester compatible avec le code qui lit les réponses slskd brutes"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self) -> dict:
+        return {key: self._json(getattr(self, key)) for key in self.__slots__}
+
+    @staticmethod
+    def _json(value):
+        if isinstance(value, list):
+            return [v.to_dict() if isinstance(v, _Record) else v for v in value]
+        return value
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SearchFile(_Record):
+    __slots__ = ('filename', 'size', 'bitRate', 'length', 'extension')
+
+    def __init__(self, filename, size, bitRate, length, extension):
+        self.filename = filename
+        self.size = size
+        self.bitRate = bitRate
+        self.length = length
+        self.extension = extension
+
+
+class SearchResponse(_Record):
+    __slots__ = ('username', 'files', 'hasFreeUploadSlot', 'queueLength', 'uploadSpeed')
+
+    def __init__(self, username, files, hasFreeUploadSlot, queueLength, uploadSpeed):
+        self.username = username
+        self.files = files
+        self.hasFreeUploadSlot = hasFreeUploadSlot
+        self.queueLength = queueLength
+        self.uploadSpeed = uploadSpeed
+
+
+class ResponseCompactor:
+    """Réduit chaque réponse slskd aux champs utiles; les fichiers hors format ou sous MIN_BITRATE
+    ne deviennent jamais des records"""
+
+    def __init__(self, formats=None, min_bitrate: int = None):
+        self.formats = frozenset(f.strip().lower() for f in (formats or Config.AUDIO_FORMATS))
+        self.min_bitrate = Config.MIN_BITRATE if min_bitrate is None else min_bitrate
+
+    def __call__(self, response: dict):
+        username = response.get('username')
+        if not username:
+            return None
+
+        files = []
+        for file in response.get('files') or ():
+            filename = file.get('filename')
+            if not filename:
+                continue
+            extension = (file.get('extension') or os.path.splitext(filename)[1].lstrip('.')).lower()
+            if extension not in self.formats:
+                continue
+            bitrate = file.get('bitRate')
+            if extension not in LOSSLESS_FORMATS and bitrate and bitrate < self.min_bitrate:
+                continue
+            files.append(SearchFile(filename, file.get('size') or 0, bitrate, file.get('length'), extension))
+
+        if not files:
+            return None
+        return SearchResponse(username, files, bool(response.get('hasFreeUploadSlot')),
+                              response.get('queueLength') or 0, response.get('uploadSpeed') or 0)
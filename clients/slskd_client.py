@@ -0,0 +1,249 @@
+import asyncio
+import codecs
+import json
+import logging
+import re
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import quote
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = 'v0'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+class SlskdApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"slskd api error ({status}): {message}")
+        self.status = status
+
+
+class AsyncSlskdClient:
+    """Client slskd asynchrone, une seule ClientSession keep-alive pour tout le run"""
+
+    def __init__(self, host: str, api_key: str = None, username: str = None,
+                 password: str = None, url_base: str = '/', max_connections: int = 20,
+                 request_timeout: float = 30):
+        base = url_base.strip('/')
+        self.api_url = f"{host.rstrip('/')}/{base + '/' if base else ''}api/{API_VERSION}"
+        self.api_key = api_key
+        self.username = username
+        self.password = password
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._open_lock = asyncio.Lock()
+        self._login_lock = asyncio.Lock()
+
+        if not api_key and not (username and password):
+            raise ValueError("please provide an api key or username/password for slskd")
+
+    @property
+    def closed(self) -> bool:
+        return self.session is None or self.session.closed
+
+    async def open(self):
+        async with self._open_lock:
+            if not self.closed:
+                return
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=60
+            )
+            headers = {'accept': '*/*'}
+            if self.api_key:
+                headers['X-API-Key'] = self.api_key
+
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+
+            if not self.api_key:
+                token = await self._login()
+                self.session.headers['Authorization'] = f"Bearer {token}"
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _login(self) -> str:
+        url = f"{self.api_url}/session"
+        payload = {'username': self.username, 'password': self.password}
+        async with self.session.post(url, json=payload) as response:
+            if response.status >= 400:
+                raise SlskdApiError(response.status, await response.text())
+            data = await response.json()
+            return data['token']
+
+    async def _refresh_token(self, stale: str):
+        """Le JWT de slskd expire: nouveau login, une seule fois pour toutes les requêtes refusées en même temps"""
+        async with self._login_lock:
+            if self.session.headers.get('Authorization') != stale:
+                return
+            logger.info("slskd token expired, logging in again")
+            token = await self._login()
+            self.session.headers['Authorization'] = f"Bearer {token}"
+
+    @asynccontextmanager
+    async def _response(self, method: str, path: str, json_body=None, params: dict = None):
+        if self.closed:
+            await self.open()
+
+        url = f"{self.api_url}{path}"
+        if params:
+            # aiohttp n'accepte pas les bool dans les query params
+            params = {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items()}
+
+        stale = None
+        for _ in range(2):
+            if stale is not None:
+                await self._refresh_token(stale)
+            token = self.session.headers.get('Authorization')
+            async with self.session.request(method, url, json=json_body, params=params) as response:
+                if response.status == 401 and not self.api_key and stale is None:
+                    # un seul nouvel essai après re-login
+                    stale = token
+                    continue
+                if response.status >= 400:
+                    raise SlskdApiError(response.status, await response.text())
+                yield response
+                return
+
+    async def _request(self, method: str, path: str, json_body=None, params: dict = None,
+                       expect_json: bool = True):
+        async with self._response(method, path, json_body=json_body, params=params) as response:
+            if not expect_json:
+                return True
+            body = await response.text()
+            if not body:
+                return None
+            return json.loads(body)
+
+    # application / server
+
+    async def application_state(self) -> dict:
+        return await self._request('GET', '/application')
+
+    async def application_version(self) -> str:
+        return await self._request('GET', '/application/version')
+
+    async def server_state(self) -> dict:
+        return await self._request('GET', '/server')
+
+    async def server_connect(self) -> bool:
+        return await self._request('PUT', '/server', expect_json=False)
+
+    # searches
+
+    async def search_text(self, search_text: str, id: Optional[str] = None,
+                          file_limit: int = 10000, filter_responses: bool = True,
+                          maximum_peer_queue_length: int = 30,
+                          minimum_peer_upload_speed: int = 100000,
+                          minimum_response_file_count: int = 1,
+                          response_limit: int = 500, search_timeout: int = 5000) -> dict:
+        data = {
+            'id': id or str(uuid.uuid4()),
+            'fileLimit': file_limit,
+            'filterResponses': filter_responses,
+            'maximumPeerQueueLength': maximum_peer_queue_length,
+            'minimumPeerUploadSpeed': minimum_peer_upload_speed,
+            'minimumResponseFileCount': minimum_response_file_count,
+            'responseLimit': response_limit,
+            'searchText': search_text,
+            'searchTimeout': search_timeout,
+        }
+        return await self._request('POST', '/searches', json_body=data)
+
+    async def search_state(self, id: str, include_responses: bool = False) -> dict:
+        return await self._request('GET', f'/searches/{id}',
+                                   params={'includeResponses': include_responses})
+
+    async def search_responses(self, id: str) -> list:
+        return await self._request('GET', f'/searches/{id}/responses')
+
+    async def iter_search_responses(self, id: str):
+        """Réponses décodées une à une depuis le corps HTTP, sans jamais charger tout le tableau"""
+        async with self._response('GET', f'/searches/{id}/responses') as response:
+            async for item in _iter_json_array(response.content):
+                yield item
+
+    async def stop_search(self, id: str) -> bool:
+        return await self._request('PUT', f'/searches/{id}', expect_json=False)
+
+    async def delete_search(self, id: str) -> bool:
+        return await self._request('DELETE', f'/searches/{id}', expect_json=False)
+
+    # transfers
+
+    async def enqueue(self, username: str, files: list) -> dict:
+        """Renvoie {'enqueued': [...], 'failed': [...]} (dict vide sur les versions de slskd sans corps de réponse)"""
+        payload = [{'filename': f['filename'], 'size': f['size']} for f in files]
+        result = await self._request('POST', f'/transfers/downloads/{quote(username, safe="")}',
+                                     json_body=payload)
+        return result if isinstance(result, dict) else {}
+
+    async def get_all_downloads(self, include_removed: bool = False) -> list:
+        return await self._request('GET', '/transfers/downloads/',
+                                   params={'includeRemoved': include_removed})
+
+    async def get_downloads(self, username: str) -> dict:
+        return await self._request('GET', f'/transfers/downloads/{quote(username, safe="")}')
+
+    async def cancel_download(self, username: str, id: str, remove: bool = False) -> bool:
+        return await self._request('DELETE', f'/transfers/downloads/{quote(username, safe="")}/{id}',
+                                   params={'remove': remove}, expect_json=False)
+
+
+async def _iter_json_array(stream, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Décode un tableau JSON élément par élément; le tampon ne garde que l'élément en cours de lecture"""
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos = '', 0
+    opened = False
+
+    async for chunk in stream.iter_chunked(chunk_size):
+        buffer = buffer[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if not opened:
+                if buffer[pos] != '[':
+                    raise json.JSONDecodeError("expected a json array", buffer, pos)
+                opened = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # élément coupé entre deux chunks
+                break
+            if end == len(buffer):
+                # un nombre en fin de tampon peut continuer dans le chunk suivant
+                break
+            pos = end
+            yield item
+
+    buffer = buffer[pos:] + text.decode(b'', final=True)
+    if opened or buffer.strip():
+        raise json.JSONDecodeError("unterminated json array", buffer, 0)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+LOGGED_IN = 'Connected, LoggedIn'
+CONNECTING = ('Connected', 'Connecting', 'Logging in')
+
+
+class SlskdConnectionManager:
+    """Vérifie slskd et le réseau soulseek une fois, puis garde le résultat en cache pendant health_ttl"""
+
+    def __init__(self, api, health_ttl: float = None, connect_timeout: float = None):
+        self.api = api
+        self.health_ttl = Config.SLSKD_HEALTH_TTL if health_ttl is None else health_ttl
+        self.connect_timeout = connect_timeout or Config.SLSKD_CONNECT_TIMEOUT
+        self.checked_at = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        return (self.checked_at is not None and not self.api.closed
+                and time.monotonic() - self.checked_at < self.health_ttl)
+
+    def invalidate(self):
+        self.checked_at = None
+
+    async def ensure_ready(self):
+        if self.fresh:
+            return
+
+        async with self._lock:
+            if self.fresh:
+                return
+
+            started = time.monotonic()
+            await self.api.open()
+            try:
+                # application et serveur interrogés en parallèle sur la session partagée
+                application, server = await asyncio.gather(self.api.application_state(), self.api.server_state())
+            except Exception:
+                await self._diagnose()
+                raise
+
+            logger.debug("slskd application state: %s", application)
+            state = server.get('state')
+            if state != LOGGED_IN:
+                await self._connect_soulseek(state)
+
+            self.checked_at = time.monotonic()
+            logger.info("slskd ready in %.2fs", self.checked_at - started)
+
+    async def _connect_soulseek(self, state: str):
+        logger.info("soulseek state: %s, connecting...", state)
+        if state not in CONNECTING:
+            await self.api.server_connect()
+
+        deadline = time.monotonic() + self.connect_timeout
+        delay = 0.1
+        reconnected_at = time.monotonic()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            state = (await self.api.server_state()).get('state')
+            if state == LOGGED_IN:
+                logger.info("connected and logged in on the soulseek network")
+                return
+            if state == 'Disconnected' and time.monotonic() - reconnected_at > 5:
+                logger.warning("soulseek still disconnected, retrying")
+                await self.api.server_connect()
+                reconnected_at = time.monotonic()
+            delay = min(delay * 1.5, 2)
+
+        raise Exception(f"could not connect to the soulseek network after {self.connect_timeout:.0f}s, "
+                        f"last state: {state}")
+
+    async def _diagnose(self):
+        """Seulement en cas d'échec: sondes parallèles pour expliquer l'erreur dans les logs"""
+        probes = {'version': self.api.application_version(), 'server': self.api.server_state()}
+        results = await asyncio.gather(*probes.values(), return_exceptions=True)
+        for name, result in zip(probes, results):
+            status = getattr(result, 'status', None)
+            if status == 401:
+                logger.error("%s probe: authentication error (401) - verify username/password/apikey", name)
+            elif status == 403:
+                logger.error("%s probe: forbidden error (403)", name)
+            elif status == 404:
+                logger.error("%s probe: endpoint not found (404) - verify url and slskd version", name)
+            elif isinstance(result, Exception):
+                logger.error("%s probe failed: %r", name, result)
+            else:
+                logger.info("%s probe ok: %s", name, result)
@@ -1,33 +1,38 @@
 import asyncio
 import logging
 import time
-import unicodedata
-import slskd_api 
-import re
 from config import Config
 from urllib.parse import urlparse
 import aiohttp
+from clients.slskd_client import AsyncSlskdClient
+from clients.slskd_connection import SlskdConnectionManager
+from clients.search_records import ResponseCompactor
+from services.ranking import CandidateRanker
+from services.metrics import metrics
+from services.query_planner import base_query, plan_queries
 
 
 logger = logging.getLogger(__name__)
 
 class SoulseekClient:
-    def __init__(self):
+    def __init__(self, scheduler=None, search_cache=None, ranker=None, reputation=None, response_index=None,
+                 verifier=None):
+        self.scheduler = scheduler
+        self.verifier = verifier
+        self.search_cache = search_cache
+        self.reputation = reputation
+        self.response_index = response_index
+        self.ranker = ranker or CandidateRanker()
+        self.compact = ResponseCompactor()
         self.host = self._validate_host_url(Config.SLSKD_HOST)
-        
-        if Config.SLSKD_API_KEY:
-            self.api = slskd_api.SlskdClient(
-                host=self.host,
-                username=Config.SLSKD_USERNAME,
-                password=Config.SLSKD_PASSWORD,
-                api_key=Config.SLSKD_API_KEY
-            )
-        else:
-            self.api = slskd_api.SlskdClient(
-                host=self.host,
-                username=Config.SLSKD_USERNAME,
-                password=Config.SLSKD_PASSWORD
-            )
+        self.api = AsyncSlskdClient(
+            host=self.host,
+            api_key=Config.SLSKD_API_KEY,
+            username=Config.SLSKD_USERNAME,
+            password=Config.SLSKD_PASSWORD,
+            max_connections=Config.SLSKD_MAX_CONNECTIONS
+        )
+        self.connection = SlskdConnectionManager(self.api)
         self.connected = False
     
     def _validate_host_url(self, host):
@@ -47,214 +52,380 @@ class SoulseekClient:
         return host
     
     async def connect(self):
+        """Quasi instantané quand la dernière vérification est encore fraîche"""
         try:
-            logger.info("Tentative de connexion à slskd...")
-            
-            await self._diagnose_connection()
-            
-            try:
-                status = self.api.application.state()
-                logger.info(f"slskd status: {status}")
-            except Exception as api_error:
-                logger.warning(f"Erreur API application.state(): {api_error}")
-                # Essayer une autre méthode
-                try:
-                    version = self.api.application.version()
-                    logger.info(f"slskd version: {version}")
-                except Exception as version_error:
-                    logger.error(f"Impossible d'obtenir la version: {version_error}")
-                    raise
-            
-            # Vérifier et établir la connexion Soulseek
-            await self._ensure_soulseek_connection()
-            
+            await self.connection.ensure_ready()
             self.connected = True
-            logger.info("Connecté à slskd avec succès")
-            
         except Exception as e:
             logger.error(f"Erreur de connexion à slskd: {e}")
             logger.error(f"Configuration utilisée - Host: {self.host}, Username: {Config.SLSKD_USERNAME}")
             raise
     
-    async def _ensure_soulseek_connection(self):
-        """S'assurer que slskd est connecté au réseau Soulseek"""
-        try:
-            # Vérifier l'état de la connexion Soulseek
-            server_state = self.api.server.state()
-            logger.info(f"État du serveur Soulseek: {server_state}")
-            
-            if server_state.get('state') == 'Disconnected':
-                logger.info("Connexion au réseau Soulseek en cours...")
-                
-                # Tenter de se connecter au serveur Soulseek
-                connect_result = self.api.server.connect()
-                logger.info(f"Résultat de connexion Soulseek: {connect_result}")
-                
-                # Attendre que la connexion s'établisse
-                max_attempts = 30  # 30 secondes max
-                for attempt in range(max_attempts):
-                    await asyncio.sleep(1)
-                    current_state = self.api.server.state()
-                    logger.debug(f"Tentative {attempt + 1}: État = {current_state.get('state', 'Unknown')}")
-                    
-                    if current_state.get('state') == 'Connected, LoggedIn':
-                        logger.info("Connecté et authentifié sur le réseau Soulseek")
-                        return
-                    elif current_state.get('state') in ['Connected', 'Connecting', 'Logging in']:
-                        continue  # En cours de connexion
-                    elif current_state.get('state') == 'Disconnected':
-                        if attempt > 5:  # Retry après quelques tentatives
-                            logger.warning("Nouvelle tentative de connexion Soulseek...")
-                            self.api.server.connect()
-                
-                # Si on arrive ici, la connexion a échoué
-                final_state = self.api.server.state()
-                raise Exception(f"Impossible de se connecter au réseau Soulseek après 30s. État final: {final_state.get('state', 'Unknown')}")
-            
-            elif server_state.get('state') == 'Connected, LoggedIn':
-                logger.info("Déjà connecté et authentifié sur le réseau Soulseek")
-            else:
-                logger.warning(f"État Soulseek inattendu: {server_state.get('state')}")
-                
-        except Exception as e:
-            logger.error(f"Erreur lors de la connexion Soulseek: {e}")
-            raise
-    
-    async def _diagnose_connection(self):
-        
-        test_urls = [
-            f"{self.host}",
-            f"{self.host}/api/v0/application/version",
-            f"{self.host}/api/v0/application/state"
-        ]
-        
-        async with aiohttp.ClientSession() as session:
-            for url in test_urls:
-                try:
-                    logger.info(f"url test: {url}")
-                    
-                    auth = None
-                    if Config.SLSKD_USERNAME and Config.SLSKD_PASSWORD:
-                        auth = aiohttp.BasicAuth(Config.SLSKD_USERNAME, Config.SLSKD_PASSWORD)
-                    
-                    headers = {}
-                    if Config.SLSKD_API_KEY:
-                        headers['X-API-Key'] = Config.SLSKD_API_KEY
-                    
-                    async with session.get(url, auth=auth, headers=headers, timeout=10) as response:
-                        logger.info(f"Status: {response.status}")
-                        logger.info(f"Content-Type: {response.headers.get('Content-Type', 'N/A')}")
-                        
-                        content = await response.text()
-                        if len(content) > 500:
-                            content = content[:500] + "..."
-                        
-                        if response.status == 401:
-                            logger.error("authentication error (401) - verify username/password/apikey")
-                        elif response.status == 403:
-                            logger.error("forbidden error (403)")
-                        elif response.status == 404:
-                            logger.error("endpoint not found (404) - verify url and slskd version")
-                        elif response.status >= 500:
-                            logger.error(f"server error ({response.status}) - slskd issue")
-                        
-                except asyncio.TimeoutError:
-                    logger.error(f"{url} timeout")
-                except Exception as e:
-                    logger.error(f"test error {url}: {e}")
-    
-    
     async def disconnect(self):
+        self.connection.invalidate()
+        await self.api.close()
         if self.connected:
             self.connected = False
             logger.info("disconnected from slskd")
     
     async def search_and_download(self, track: dict) -> dict:
-        await asyncio.sleep(1)
+        try:
+            search_responses = await self.search_track(track)
+            if len(search_responses) == 0:
+                print(f"🙀 {track['artist']} - {track['title']} - not found")
+                return {'success': False, 'error': 'track not found'}
+
+            candidates = self.rank_candidates(track, search_responses)
+            return await self.download_candidates(track, candidates)
+
+        except Exception as e:
+            logger.error(f"search / download error: {e}")
+            return {'success': False, 'error': str(e)}
+
+    async def search_track(self, track: dict) -> list:
         track_artist_title = f"{track['artist']} - {track['title']}"
         print(f"track: {track_artist_title}")
 
-        try:
-            query = self._format_search_query(track)
-            search_results = self.api.searches.search_text(query)
-
-            while True:
-                logger.debug(f"search: {search_results}")
-                state = self.api.searches.state(search_results["id"])
-                if state["state"] != "InProgress":
-                    break
-                await asyncio.sleep(2)
-            search_responses = self.api.searches.search_responses(search_results["id"])
-            print(f"😡 {search_responses}")
-            print(f"🤓 processing track: {track_artist_title}")
+        is_good = lambda responses: self._has_good_candidate(track, responses)
 
-            if len(search_responses) == 0:
-                print(f"🙀 {track_artist_title} - not found")
-                return {'success': False, 'error': 'track not found'}
+        if self.response_index is not None:
+            # déjà vu dans le dossier d'un peer lors d'une recherche précédente
+            local = self.response_index.lookup(track)
+            if local and is_good(local):
+                logger.info("found in previous search results: %s", track_artist_title)
+                metrics.inc('response_index_hits')
+                return local
+            metrics.inc('response_index_misses')
+
+        queries = plan_queries(track)
+        if len(queries) == 1:
+            return await self._cached_search(queries[0], is_good=is_good)
+        return await self._search_variants(queries, is_good)
+
+    async def _search_variants(self, queries: list, is_good) -> list:
+        """Requête de base d'abord; si elle n'a pas de bon candidat, les variantes de repli partent ensemble
+        (chacune sous le scheduler), la première avec un bon candidat gagne et les autres sont annulées"""
+        merged = []
+        seen = set()
 
-            mp3_responses = []
-            flac_responses = []
+        def merge(responses):
+            # aucune variante décisive: on classe l'union des réponses
+            for response in responses:
+                files = [f for f in response.get('files') or ()
+                         if (response.get('username'), f.get('filename')) not in seen]
+                if files:
+                    seen.update((response.get('username'), f.get('filename')) for f in files)
+                    merged.append({**response, 'files': files})
 
-            for singleTrack in search_responses:
-                if len(singleTrack["files"]) == 0:
+        try:
+            responses = await self._cached_search(queries[0], is_good=is_good)
+        except Exception as e:
+            logger.warning("search variant failed: %s", e)
+            responses = []
+        if responses and is_good(responses):
+            return responses
+        merge(responses)
+
+        logger.debug("no good candidate for '%s', trying %d variants", queries[0], len(queries) - 1)
+        searches = [asyncio.create_task(self._cached_search(query, is_good=is_good)) for query in queries[1:]]
+        queries_by_task = dict(zip(searches, queries[1:]))
+        try:
+            for search in asyncio.as_completed(searches):
+                try:
+                    responses = await search
+                except Exception as e:
+                    logger.warning("search variant failed: %s", e)
                     continue
-                filename = singleTrack["files"][0]["filename"]
 
-                if self._is_valid_audio_file(filename, "mp3"):
-                    if "bitRate" not in singleTrack["files"][0]: 
-                        continue
-                    if singleTrack["files"][0]["bitRate"] == 320:
-                        mp3_responses.append(singleTrack)
-                        break
+                if responses and is_good(responses):
+                    metrics.inc('search_variant_wins')
+                    return responses
+                merge(responses)
+            return merged
+        finally:
+            for search in searches:
+                if not search.done():
+                    search.cancel()
+                    logger.debug("search variant cancelled: %s", queries_by_task[search])
 
-                if self._is_valid_audio_file(filename, "flac"):
-                    flac_responses.append(singleTrack)
-            
-            if len(mp3_responses) > 0:
-                print(f"👾 // downloading: {mp3_responses[0]}")
-                downloading = self._download_file(mp3_responses[0])
-                if downloading["success"]:
-                    return {'success': True, 'message': f"downloading mp3 {track}"}
-            
-            if len(flac_responses) > 0:
-                print(f"👾 // downloading: {flac_responses[0]}")
-                downloading = self._download_file(flac_responses[0])
-                if downloading["success"]:
-                    return {'success': True, 'message': f"downloading flac {track}"}
-                
+    async def search_album(self, album: dict) -> list:
+        print(f"album: {album['artist']} - {album['album']}")
+
+        query = base_query({'artist': album['artist'], 'title': album['album']})
+        return await self._cached_search(
+            query, is_good=lambda responses: self._has_full_album(album, responses)
+        )
+
+    async def _cached_search(self, query: str, is_good=None) -> list:
+        if self.search_cache is not None:
+            cached = await self.search_cache.get(query)
+            if cached is not None:
+                logger.info("search cache hit: %s", query)
+                metrics.inc('search_cache_hits')
+                if self.response_index is not None:
+                    self.response_index.add(cached)
+                return cached
+            metrics.inc('search_cache_misses')
+
+        search_responses = await self._scheduled_search(query, is_good=is_good)
+        self._log_search_summary(query, search_responses)
+        if self.response_index is not None:
+            self.response_index.add(search_responses)
+
+        if self.search_cache is not None:
+            await self.search_cache.set(query, search_responses)
+        return search_responses
+
+    def _log_search_summary(self, query: str, responses: list):
+        """Résumé court; le dump complet des réponses (souvent des centaines de Ko) seulement en DEBUG"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        files = sum(len(r.get('files') or ()) for r in responses)
+        free = sum(1 for r in responses if r.get('hasFreeUploadSlot'))
+        logger.info("search '%s': %d responses, %d files, %d peers with a free slot",
+                    query, len(responses), files, free)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("search responses for '%s': %s", query, responses)
+
+    def rank_candidates(self, track: dict, search_responses: list) -> list:
+        """Retourne les meilleurs fichiers (un par candidat), meilleur en premier"""
+        with metrics.timer('rank_seconds'):
+            candidates = self.ranker.rank(track, search_responses)
+            if self.reputation is not None:
+                # peers lents ou qui n'aboutissent jamais relégués, les pires écartés avant l'enqueue
+                candidates = self.reputation.rerank(candidates)
+        if candidates:
+            logger.debug("best candidate (score %.2f): %s", candidates[0]['score'], candidates[0]['files'][0]['filename'])
+        return candidates
+
+    async def download_candidates(self, track: dict, candidates: list, monitor=None, on_enqueued=None) -> dict:
+        """Enqueue le meilleur candidat; avec un monitor, attend la fin du transfert et bascule sur le suivant en cas d'échec"""
+        track_artist_title = f"{track['artist']} - {track['title']}"
+        print(f"🤓 processing track: {track_artist_title}")
+
+        if len(candidates) == 0:
             print(f"🙀 could not find {track_artist_title} with specified criteria")
             return {'success': False, 'error': 'could not find track with specified criteria'}
 
-        except Exception as e:
-            logger.error(f"search / download error: {e}")
-            return {'success': False, 'error': str(e)}
-    
-    def _remove_accents(self, text: str) -> str:
-        return ''.join(
-            c for c in unicodedata.normalize("NFKD", text)
-            if not unicodedata.combining(c)
+        error = 'enqueue failed for every candidate'
+        for candidate in candidates:
+            if candidate.get('reattach'):
+                # transfert repris d'un run précédent, déjà connu de slskd
+                print(f"🔁 // re-attaching: {candidate['username']} / {candidate['files'][0]['filename']}")
+            else:
+                print(f"👾 // downloading: {candidate['username']} / {candidate['files'][0]['filename']}")
+                downloading = await self._download_file(candidate)
+                if not downloading["success"]:
+                    continue
+                if on_enqueued is not None:
+                    on_enqueued(track, candidate, downloading["transfers"])
+
+            filename = candidate["files"][0]["filename"]
+            extension = filename.rsplit('.', 1)[-1].lower()
+            if monitor is None:
+                return {'success': True, 'message': f"downloading {extension} {track}"}
+
+            transfer = await monitor.watch(candidate['username'], filename)
+            metrics.observe('transfer_seconds', transfer.get('elapsed') or 0)
+            if transfer['success']:
+                metrics.inc('transfer_bytes', transfer['bytes'] or 0)
+                check = await self._verify(track, candidate['files'][0])
+                if check['ok']:
+                    print(f"✅ {track_artist_title} - downloaded from {candidate['username']}")
+                    return {'success': True, 'message': f"downloaded {extension} {track}",
+                            'bytes': transfer['bytes'], 'files': 1, 'transfer': transfer}
+
+                print(f"💀 {track_artist_title} - {candidate['username']}: {check['reason']}, trying next candidate")
+                error = f"verification failed: {check['reason']}"
+                continue
+
+            metrics.inc('transfer_failures')
+            print(f"💀 {track_artist_title} - {candidate['username']}: {transfer['state']}, trying next candidate")
+            error = f"transfer failed: {transfer['state']}"
+
+        return {'success': False, 'error': error}
+
+    def rank_album(self, album: dict, search_responses: list):
+        plan = self.ranker.rank_album(album, search_responses)
+        if plan:
+            logger.debug("album folder %s / %s covers %.0f%%", plan['username'], plan['directory'], plan['coverage'] * 100)
+        return plan
+
+    async def download_album(self, album: dict, plan: dict, monitor=None, on_enqueued=None) -> dict:
+        """Enqueue tous les fichiers du dossier retenu en un seul appel; renvoie {index de track: résultat ou None}"""
+        album_title = f"{album['artist']} - {album['album']}"
+        matches = plan['matches']
+        indexes = sorted(matches)
+        files = [matches[i] for i in indexes]
+
+        print(f"👾 // downloading album {album_title}: {len(files)} files from {plan['username']}")
+        downloading = await self._download_file({'username': plan['username'], 'files': files})
+        if not downloading["success"]:
+            return {i: None for i in range(len(album['tracks']))}
+
+        if on_enqueued is not None:
+            for i in indexes:
+                candidate = {'username': plan['username'], 'files': [matches[i]]}
+                on_enqueued(album['tracks'][i], candidate, downloading["transfers"])
+
+        results = {i: None for i in range(len(album['tracks']))}
+        if monitor is None:
+            for i in indexes:
+                results[i] = {'success': True, 'message': f"downloading {album['tracks'][i]}"}
+            return results
+
+        transfers = await asyncio.gather(*(monitor.watch(plan['username'], f['filename']) for f in files))
+        # vérifications en parallèle; un fichier refusé laisse un trou, repris en recherche par track
+        checks = await asyncio.gather(*(
+            self._verify(album['tracks'][i], matches[i]) if transfer['success'] else asyncio.sleep(0, {'ok': False})
+            for i, transfer in zip(indexes, transfers)
+        ))
+        for i, transfer, check in zip(indexes, transfers, checks):
+            metrics.observe('transfer_seconds', transfer.get('elapsed') or 0)
+            if transfer['success']:
+                metrics.inc('transfer_bytes', transfer['bytes'] or 0)
+            if transfer['success'] and check['ok']:
+                results[i] = {'success': True, 'message': f"downloaded {album['tracks'][i]}",
+                              'bytes': transfer['bytes'], 'files': 1, 'transfer': transfer}
+        return results
+
+    async def _verify(self, track: dict, file: dict) -> dict:
+        if self.verifier is None:
+            return {'ok': True}
+        with metrics.timer('verify_seconds'):
+            check = await self.verifier.verify(track, file)
+        if not check['ok']:
+            metrics.inc('verify_failures')
+            logger.warning("verification failed for %s: %s", file['filename'], check['reason'])
+            self.verifier.reject(check)
+        return check
+
+    def _has_full_album(self, album: dict, responses: list) -> bool:
+        plan = self.ranker.rank_album(album, responses)
+        return plan is not None and plan['coverage'] >= 1
+
+    async def _scheduled_search(self, query: str, is_good=None) -> list:
+        if self.scheduler is None:
+            responses, _, _ = await self._run_search(query, is_good)
+            return responses
+
+        async with self.scheduler.search_slot():
+            try:
+                responses, latency, received = await self._run_search(query, is_good)
+            except asyncio.TimeoutError:
+                await self.scheduler.record(self.scheduler.TIMEOUT)
+                raise
+            except Exception as e:
+                if isinstance(e, aiohttp.ClientConnectionError):
+                    # slskd injoignable: la prochaine connexion refait une vérification complète
+                    self.connection.invalidate()
+                await self.scheduler.record(self.scheduler.ERROR)
+                raise
+
+        # des réponses toutes filtrées (format, bitrate) ne sont pas un signe de throttling
+        outcome = self.scheduler.OK if received else self.scheduler.EMPTY
+        await self.scheduler.record(outcome, latency)
+        return responses
+
+    async def _run_search(self, query: str, is_good=None) -> tuple:
+        """Lance la recherche et lit les réponses partielles, arrêt anticipé dès qu'un candidat suffit"""
+        started = time.monotonic()
+        search = await self.api.search_text(
+            query,
+            search_timeout=Config.SEARCH_TIMEOUT_MS,
+            response_limit=Config.SEARCH_RESPONSE_LIMIT,
+            file_limit=Config.SEARCH_FILE_LIMIT
         )
-    
-    def _format_search_query(self, track: dict) -> str:
-        artist = track['artist']
-        title = track['title']
+        # latence de prise en charge par slskd, utilisée par le scheduler
+        latency = time.monotonic() - started
+        search_id = search["id"]
+        logger.debug("search: %s", search)
 
-        artist = re.sub(r'[^\w\s]', ' ', artist).strip()
-        title = re.sub(r'[^\w\s]', ' ', title).strip()
-        
-        artist = self._remove_accents(artist)
-        title = self._remove_accents(title)
+        is_good = is_good or (lambda found: any(self._meets_quality_bar(r) for r in found))
+        try:
+            responses, polls, received = await self._poll_search(search_id, query, is_good)
+        except asyncio.CancelledError:
+            # recherche annulée (variante perdante ou job arrêté): on libère la recherche côté slskd
+            try:
+                await asyncio.shield(self.api.stop_search(search_id))
+            except Exception as e:
+                logger.debug("stop search error: %s", e)
+            raise
+
+        metrics.observe('search_seconds', time.monotonic() - started)
+        metrics.observe('search_submit_seconds', latency)
+        metrics.observe_count('search_polls', polls)
+        metrics.observe_count('search_responses', len(responses))
+        metrics.observe_count('search_files', sum(len(r.get('files') or ()) for r in responses))
+        metrics.inc('search_responses_filtered', max(received - len(responses), 0))
+        if not responses:
+            metrics.inc('search_empty')
+        return responses, latency, received
+
+    async def _poll_search(self, search_id: str, query: str, is_good) -> tuple:
+        responses = []
+        received = 0
+        delay = Config.SEARCH_POLL_MIN
+        polls = 0
+
+        while True:
+            await asyncio.sleep(delay)
+            polls += 1
+            state = await self.api.search_state(search_id)
+            in_progress = state["state"] == "InProgress"
+
+            # slskd renvoie les réponses reçues jusqu'ici, même pendant la recherche
+            # comparé au compte de slskd et non à len(responses): les réponses filtrées n'y sont pas
+            responses_changed = state.get("responseCount", 0) != received
+            if responses_changed:
+                received = state.get("responseCount", 0)
+                responses = await self._fetch_responses(search_id)
+
+            if not in_progress:
+                break
+
+            if Config.SEARCH_EARLY_EXIT and responses_changed and is_good(responses):
+                logger.debug("early exit for '%s' after %d responses", query, len(responses))
+                await self.api.stop_search(search_id)
+                metrics.inc('search_early_exits')
+                break
+
+            delay = min(delay * Config.SEARCH_POLL_BACKOFF, Config.SEARCH_POLL_MAX)
+
+        return responses, polls, received
+
+    async def _fetch_responses(self, search_id: str) -> list:
+        """Lecture en flux: chaque réponse est filtrée et réduite en record avant de décoder la suivante"""
+        responses = []
+        async for response in self.api.iter_search_responses(search_id):
+            record = self.compact(response)
+            if record is not None:
+                responses.append(record)
+        return responses
+
+    def _has_good_candidate(self, track: dict, responses: list) -> bool:
+        candidates = self.ranker.rank(track, responses)
+        return bool(candidates) and candidates[0]['score'] >= Config.EARLY_EXIT_SCORE \
+            and self._file_meets_quality_bar(candidates[0]['files'][0])
+
+    def _meets_quality_bar(self, response: dict) -> bool:
+        return any(self._file_meets_quality_bar(file) for file in response.get("files") or ())
+
+    def _file_meets_quality_bar(self, file: dict) -> bool:
+        filename = file.get("filename", "")
+
+        if self._is_valid_audio_file(filename, "flac"):
+            return "flac" in Config.AUDIO_FORMATS
+        if self._is_valid_audio_file(filename, "mp3"):
+            return "mp3" in Config.AUDIO_FORMATS and (file.get("bitRate") or 0) >= Config.TARGET_BITRATE
+        return False
 
-        title = re.sub(r'\b(feat|ft|featuring|remix|remastered|deluxe)\b.*', '', title, flags=re.IGNORECASE)
-        
-        return f"{artist} {title}".strip()
-    
     def _is_valid_audio_file(self, filename: str, format: str) -> bool:
         if filename.lower().endswith(format): 
             return True
         return False
     
-    def _download_file(self, file: dict) -> dict:
+    async def _download_file(self, file: dict) -> dict:
         try:
             username = file.get('username')
             filename = file["files"][0].get('filename')
@@ -262,98 +433,23 @@ class SoulseekClient:
             if not username or not filename:
                 print("missing filename or username")
                 return {'success': False, 'error': 'missing filename or username'}
-            self.api.transfers.enqueue(username=username, files=file["files"])
-            return {"success": True}                
+
+            with metrics.timer('enqueue_seconds'):
+                if self.scheduler is None:
+                    result = await self.api.enqueue(username=username, files=file["files"])
+                else:
+                    async with self.scheduler.enqueue_slot():
+                        result = await self.api.enqueue(username=username, files=file["files"])
+            metrics.inc('enqueued_files', len(file["files"]))
+
+            if result.get('failed') and not result.get('enqueued'):
+                metrics.inc('enqueue_rejected')
+                if self.reputation is not None:
+                    self.reputation.record_rejection(username)
+                return {'success': False, 'error': f"enqueue rejected: {result['failed']}"}
+            return {"success": True, "transfers": result.get('enqueued') or []}
             
         except Exception as e:
             logger.error(f"download error: {e}")
+            metrics.inc('enqueue_errors')
             return {'success': False, 'error': str(e)}
-        
-    # def _meets_quality_requirements(self, file: dict) -> bool:
-    #     """Vérifie si le fichier respecte les critères de qualité"""
-    #     # Vérifier la taille (éviter les fichiers trop petits)
-    #     size = file.get('size', 0)
-    #     if size < 1024 * 1024:  # < 1MB
-    #         return False
-        
-    #     # Vérifier le bitrate si disponible
-    #     filename = file.get('filename', '').lower()
-        
-    #     # Exclure les bitrates trop bas mentionnés dans le nom
-    #     bad_bitrates = ['64kbps', '96kbps', '128kbps']
-    #     if any(br in filename for br in bad_bitrates):
-    #         return False
-        
-    #     return True
-    
-    # def _calculate_similarity_score(self, track: dict, file: dict) -> int:
-    #     """Calcule un score de similarité entre la track et le fichier"""
-    #     filename = file.get('filename', '').lower()
-        
-    #     artist = track['artist'].lower()
-    #     title = track['title'].lower()
-        
-    #     # Score basé sur la similarité fuzzy
-    #     artist_score = fuzz.partial_ratio(artist, filename)
-    #     title_score = fuzz.partial_ratio(title, filename)
-        
-    #     # Score combiné
-    #     combined_score = (artist_score + title_score) / 2
-        
-    #     # Bonus pour certains formats
-    #     if '.flac' in filename:
-    #         combined_score += 10
-    #     elif '.mp3' in filename and '320' in filename:
-    #         combined_score += 5
-        
-    #     # Malus pour certains mots-clés indésirables
-    #     bad_keywords = ['karaoke', 'instrumental', 'cover', 'live']
-    #     for keyword in bad_keywords:
-    #         if keyword in filename:
-    #             combined_score -= 20
-        
-    #     return int(combined_score)
-    
-    # def _sanitize_filename(self, filename: str) -> str:
-    #     """Nettoie un nom de fichier pour le système de fichiers"""
-    #     # Supprimer les caractères interdits
-    #     invalid_chars = '<>:"/\\|?*'
-    #     for char in invalid_chars:
-    #         filename = filename.replace(char, '_')
-        
-    #     return filename.strip()
-    
-
-        # def _find_best_match(self, track: dict, files: list) -> dict:
-    #     """Trouve le meilleur match parmi les résultats"""
-    #     if not files:
-    #         return None
-        
-    #     scored_files = []
-        
-    #     for file in files:
-    #         # Vérifier le format audio
-    #         if not self._is_valid_audio_file(file.get('filename', '')):
-    #             continue
-            
-    #         # Vérifier la qualité minimum
-    #         if not self._meets_quality_requirements(file):
-    #             continue
-            
-    #         # Calculer le score de similarité
-    #         score = self._calculate_similarity_score(track, file)
-            
-    #         scored_files.append({
-    #             'file': file,
-    #             'score': score
-    #         })
-        
-    #     if not scored_files:
-    #         return None
-        
-    #     # Trier par score décroissant
-    #     scored_files.sort(key=lambda x: x['score'], reverse=True)
-        
-    #     logger.debug(f"Meilleur match (score: {scored_files[0]['score']}): {scored_files[0]['file'].get('filename')}")
-        
-    #     return scored_files[0]['file']
\ No newline at end of file
@@ -1,11 +1,20 @@
+import asyncio
+import time
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import re
 import logging
 from config import Config
+from services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+PAGE_SIZE = 100
+# seuls les champs gardés par _track_info sont demandés à l'API
+TRACK_FIELDS = "track(type,name,id,duration_ms,popularity,external_urls(spotify),album(name),artists(name))"
+ITEMS_FIELDS = f"total,items({TRACK_FIELDS})"
+PLAYLIST_FIELDS = f"name,owner(display_name),snapshot_id,tracks(total,items({TRACK_FIELDS}))"
+
 class SpotifyClient:
     def __init__(self):
 
@@ -36,13 +45,29 @@ class SpotifyClient:
                 return match.group(1)
         raise ValueError(f"invalid spotify url: {url}")
     
+    async def get_snapshot_id(self, playlist_url: str) -> str:
+        """snapshot_id change à chaque modification de la playlist, sans avoir à lire ses tracks"""
+        playlist_id = self.extract_playlist_id(playlist_url)
+        playlist = await asyncio.to_thread(self.sp.playlist, playlist_id, fields='snapshot_id')
+        return playlist['snapshot_id']
+
     async def get_playlist_tracks(self, playlist_url: str) -> list:
+        tracks = [track async for track in self.iter_playlist_tracks(playlist_url)]
+        logger.info(f"found {len(tracks)} tracks")
+        return tracks
+
+    async def iter_playlist_tracks(self, playlist_url: str):
+        """Renvoie les tracks page par page; les pages après la première sont récupérées en parallèle.
+        spotify_playlist_seconds mesure la récupération des pages, pas le temps passé chez le consommateur"""
+        started = time.perf_counter()
         try:
             playlist_id = self.extract_playlist_id(playlist_url)
             logger.info(f"extracted playlist id: {playlist_id}")
             
             try:
-                playlist = self.sp.playlist(playlist_id)
+                # la première page arrive avec la playlist, on en déduit le total
+                with metrics.timer('spotify_page_seconds'):
+                    playlist = await asyncio.to_thread(self.sp.playlist, playlist_id, fields=PLAYLIST_FIELDS)
                 logger.info(f"playlist: {playlist['name']} by {playlist['owner']['display_name']}")
             except Exception as e:
                 if "404" in str(e) or "not found" in str(e).lower():
@@ -50,45 +75,66 @@ class SpotifyClient:
                 else:
                     raise e
             
-            tracks = []
+            first_page = playlist['tracks']
+            for track_info in self._page_tracks(first_page):
+                yield track_info
+
+            total = first_page['total']
+            page_size = len(first_page['items']) or PAGE_SIZE
+            offsets = range(page_size, total, PAGE_SIZE)
+            if not offsets:
+                metrics.observe('spotify_playlist_seconds', time.perf_counter() - started)
+                return
+
+            workers = asyncio.Semaphore(Config.SPOTIFY_FETCH_WORKERS)
+            pages = [asyncio.create_task(self._fetch_page(playlist_id, offset, workers)) for offset in offsets]
+            asyncio.gather(*pages, return_exceptions=True).add_done_callback(
+                lambda fetched: _observe_playlist(fetched, started)
+            )
+            try:
+                for page in asyncio.as_completed(pages):
+                    for track_info in self._page_tracks(await page):
+                        yield track_info
+            finally:
+                for page in pages:
+                    page.cancel()
             
+        except Exception as e:
+            logger.error(f"error while getting playlist informations: {e}")
+            raise
+
+    async def _fetch_page(self, playlist_id: str, offset: int, workers: asyncio.Semaphore) -> dict:
+        async with workers:
             try:
-                results = self.sp.playlist_tracks(playlist_id)
+                with metrics.timer('spotify_page_seconds'):
+                    return await asyncio.to_thread(
+                        self.sp.playlist_items, playlist_id, fields=ITEMS_FIELDS,
+                        limit=PAGE_SIZE, offset=offset, additional_types=('track',)
+                    )
             except Exception as e:
                 if "404" in str(e):
                     raise ValueError("authentication needed for this playlist.")
                 else:
                     raise e
-            
-            while results:
-                for item in results['items']:
-                    if item['track'] and item['track']['type'] == 'track':
-                        track = item['track']
-                        
-                        track_info = {
-                            'title': track['name'],
-                            'artist': ', '.join([artist['name'] for artist in track['artists']]),
-                            'album': track['album']['name'],
-                            'duration_ms': track['duration_ms'],
-                            'popularity': track['popularity'],
-                            'spotify_id': track['id'],
-                            'spotify_url': track['external_urls']['spotify']
-                        }
-                        
-                        tracks.append(track_info)
-                        logger.debug(f"added: {track_info['artist']} - {track_info['title']}")
-                
-                if results['next']:
-                    results = self.sp.next(results)
-                else:
-                    break
-            
-            logger.info(f"found {len(tracks)} tracks")
-            return tracks
-            
-        except Exception as e:
-            logger.error(f"error while getting playlist informations: {e}")
-            raise
+
+    def _page_tracks(self, page: dict):
+        for item in page['items']:
+            if item['track'] and item['track']['type'] == 'track':
+                track_info = self._track_info(item['track'])
+                metrics.inc('spotify_tracks')
+                logger.debug("added: %s - %s", track_info['artist'], track_info['title'])
+                yield track_info
+
+    def _track_info(self, track: dict) -> dict:
+        return {
+            'title': track['name'],
+            'artist': ', '.join([artist['name'] for artist in track['artists']]),
+            'album': track['album']['name'],
+            'duration_ms': track['duration_ms'],
+            'popularity': track['popularity'],
+            'spotify_id': track['id'],
+            'spotify_url': track['external_urls']['spotify']
+        }
     
     # def clean_search_query(self, track: dict) -> str:
     #     artist = track['artist']
@@ -100,4 +146,10 @@ class SpotifyClient:
         
     #     title = re.sub(r'\s+(feat|ft|featuring)\.?\s+.*', '', title, flags=re.IGNORECASE)
         
-    #     return f"{artist} {title}".strip()
\ No newline at end of file
+    #     return f"{artist} {title}".strip()
+
+
+def _observe_playlist(fetched, started: float):
+    # toutes les pages reçues (une page en erreur ou annulée ne compte pas)
+    if not fetched.cancelled() and not any(isinstance(page, BaseException) for page in fetched.result()):
+        metrics.observe('spotify_playlist_seconds', time.perf_counter() - started)
@@ -13,6 +13,10 @@ class Config:
     # Spotify API
     SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
     SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
+    SPOTIFY_FETCH_WORKERS = int(os.getenv('SPOTIFY_FETCH_WORKERS', 4))
+    
+    # Bandcamp (worker node persistant, voir bc-worker.js pour BC_CONCURRENCY / BC_CACHE_PATH)
+    BANDCAMP_WORKER = os.getenv('BANDCAMP_WORKER', './bc-worker.js')
     
     # slskd settings
     SLSKD_HOST = os.getenv('SLSKD_HOST', 'localhost')
@@ -20,12 +24,106 @@ class Config:
     SLSKD_API_KEY = os.getenv('SLSKD_API_KEY')
     SLSKD_USERNAME = os.getenv('SLSKD_USERNAME', 'admin')
     SLSKD_PASSWORD = os.getenv('SLSKD_PASSWORD')
+    SLSKD_MAX_CONNECTIONS = int(os.getenv('SLSKD_MAX_CONNECTIONS', 20))
+    # durée pendant laquelle un health check réussi évite de re-sonder slskd
+    SLSKD_HEALTH_TTL = float(os.getenv('SLSKD_HEALTH_TTL', 300))
+    SLSKD_CONNECT_TIMEOUT = float(os.getenv('SLSKD_CONNECT_TIMEOUT', 30))
     
     # Download settings
     DOWNLOAD_DIR = Path(os.getenv('DOWNLOAD_DIR', './downloads'))
     MAX_CONCURRENT_DOWNLOADS = int(os.getenv('MAX_CONCURRENT_DOWNLOADS', 3))
     AUDIO_FORMATS = os.getenv('AUDIO_FORMATS', 'mp3,flac,m4a').split(',')
     MIN_BITRATE = int(os.getenv('MIN_BITRATE', 192))
+    # bitrate mp3 qui suffit pour arrêter une recherche en avance
+    TARGET_BITRATE = int(os.getenv('TARGET_BITRATE', 320))
+    LIBRARY_DB = os.getenv('LIBRARY_DB', './library.db')
+    JOURNAL_DB = os.getenv('JOURNAL_DB', './jobs.db')
+    # les transitions sont commitées par lots (au plus tard après ce délai, en secondes)
+    JOURNAL_COMMIT_INTERVAL = float(os.getenv('JOURNAL_COMMIT_INTERVAL', 1.0))
+    
+    # Headless sync
+    SYNC_INTERVAL = float(os.getenv('SYNC_INTERVAL', 3600))
+    SYNC_STATE_FILE = os.getenv('SYNC_STATE_FILE', './sync_state.json')
+    
+    # Candidate ranking
+    MAX_CANDIDATES = int(os.getenv('MAX_CANDIDATES', 5))
+    MIN_MATCH_SCORE = float(os.getenv('MIN_MATCH_SCORE', 0.6))
+    DURATION_TOLERANCE = float(os.getenv('DURATION_TOLERANCE', 5))
+    EARLY_EXIT_SCORE = float(os.getenv('EARLY_EXIT_SCORE', 0.8))
+    
+    # Réputation des peers (persistée entre les runs)
+    PEER_DB = os.getenv('PEER_DB', './peers.db')
+    PEER_MIN_ATTEMPTS = int(os.getenv('PEER_MIN_ATTEMPTS', 3))
+    PEER_BAD_SUCCESS_RATE = float(os.getenv('PEER_BAD_SUCCESS_RATE', 0.2))
+    # temps de transfert estimé (s) qui divise par deux le score d'un candidat
+    PEER_ETA_SCALE = float(os.getenv('PEER_ETA_SCALE', 600))
+    
+    # Album mode (bandcamp): une recherche par album, un enqueue par peer
+    ALBUM_MODE = os.getenv('ALBUM_MODE', 'true').lower() == 'true'
+    ALBUM_MIN_COVERAGE = float(os.getenv('ALBUM_MIN_COVERAGE', 0.5))
+    
+    # Search settings
+    SEARCH_TIMEOUT_MS = int(os.getenv('SEARCH_TIMEOUT_MS', 15000))
+    SEARCH_RESPONSE_LIMIT = int(os.getenv('SEARCH_RESPONSE_LIMIT', 100))
+    SEARCH_FILE_LIMIT = int(os.getenv('SEARCH_FILE_LIMIT', 1000))
+    SEARCH_EARLY_EXIT = os.getenv('SEARCH_EARLY_EXIT', 'true').lower() == 'true'
+    # variantes de requête par track: la requête de base, puis les autres en parallèle si elle échoue (1 = requête unique)
+    SEARCH_QUERY_VARIANTS = int(os.getenv('SEARCH_QUERY_VARIANTS', 3))
+    SEARCH_POLL_MIN = float(os.getenv('SEARCH_POLL_MIN', 0.25))
+    SEARCH_POLL_MAX = float(os.getenv('SEARCH_POLL_MAX', 2))
+    SEARCH_POLL_BACKOFF = float(os.getenv('SEARCH_POLL_BACKOFF', 1.5))
+    
+    # Search scheduler (MAX_CONCURRENT_DOWNLOADS limite les enqueues simultanés)
+    MAX_CONCURRENT_SEARCHES = int(os.getenv('MAX_CONCURRENT_SEARCHES', 8))
+    MIN_CONCURRENT_SEARCHES = int(os.getenv('MIN_CONCURRENT_SEARCHES', 1))
+    SEARCHES_PER_MINUTE = int(os.getenv('SEARCHES_PER_MINUTE', 30))
+    SEARCH_SLOW_SECONDS = float(os.getenv('SEARCH_SLOW_SECONDS', 1.0))
+    SCHEDULER_WINDOW = int(os.getenv('SCHEDULER_WINDOW', 20))
+    SCHEDULER_MAX_EMPTY_RATE = float(os.getenv('SCHEDULER_MAX_EMPTY_RATE', 0.7))
+    
+    # Search cache (redis si REDIS_URL est défini, sinon LRU en mémoire)
+    REDIS_URL = os.getenv('REDIS_URL')
+    # délai de connexion/lecture redis (s); injoignable au premier usage -> LRU en mémoire
+    REDIS_TIMEOUT = float(os.getenv('REDIS_TIMEOUT', 2))
+    SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 2000))
+    SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 24 * 3600))
+    SEARCH_CACHE_MISS_TTL = int(os.getenv('SEARCH_CACHE_MISS_TTL', 30 * 60))
+    
+    # Index des fichiers vus dans les réponses, consulté avant chaque nouvelle recherche
+    RESPONSE_INDEX = os.getenv('RESPONSE_INDEX', 'true').lower() == 'true'
+    RESPONSE_INDEX_MAX_FILES = int(os.getenv('RESPONSE_INDEX_MAX_FILES', 200000))
+    RESPONSE_INDEX_TTL = float(os.getenv('RESPONSE_INDEX_TTL', 1800))
+    
+    # Pipeline
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 100))
+    
+    # Transfer monitor (attend la fin réelle des transferts, bascule sur le candidat suivant)
+    TRANSFER_MONITOR = os.getenv('TRANSFER_MONITOR', 'true').lower() == 'true'
+    TRANSFER_POLL_INTERVAL = float(os.getenv('TRANSFER_POLL_INTERVAL', 5))
+    TRANSFER_STALL_TIMEOUT = float(os.getenv('TRANSFER_STALL_TIMEOUT', 120))
+    TRANSFER_QUEUE_TIMEOUT = float(os.getenv('TRANSFER_QUEUE_TIMEOUT', 600))
+    MAX_ACTIVE_TRANSFERS = int(os.getenv('MAX_ACTIVE_TRANSFERS', 50))
+    
+    # Vérification des fichiers terminés (en-têtes mp3/flac, sans décodage)
+    VERIFY_DOWNLOADS = os.getenv('VERIFY_DOWNLOADS', 'true').lower() == 'true'
+    VERIFY_WORKERS = int(os.getenv('VERIFY_WORKERS', min(4, os.cpu_count() or 1)))
+    VERIFY_DURATION_TOLERANCE = float(os.getenv('VERIFY_DURATION_TOLERANCE', 10))
+    VERIFY_MIN_BITRATE_RATIO = float(os.getenv('VERIFY_MIN_BITRATE_RATIO', 0.8))
+    
+    # Serveur de jobs (python main.py serve); SERVER_TOKEN active l'auth par bearer token
+    SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', 8085))
+    SERVER_TOKEN = os.getenv('SERVER_TOKEN')
+    
+    # Logging (fichier tournant, écrit hors de la boucle asyncio)
+    LOG_FILE = os.getenv('LOG_FILE', 'slsk_downloader.log')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 5 * 1024 * 1024))
+    LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 3))
+    
+    # Metrics (résumé en fin de run; export .json ou texte prometheus si METRICS_FILE est défini)
+    METRICS_SUMMARY = os.getenv('METRICS_SUMMARY', 'true').lower() == 'true'
+    METRICS_FILE = os.getenv('METRICS_FILE')
     
     # Validation
     @classmethod
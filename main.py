@@ -1,61 +1,197 @@
 #!/usr/bin/env python3
 
+import argparse
 import asyncio
+import atexit
 import logging
-from services.playlist_downloader import PlaylistDownloader
-
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('slsk_downloader.log'),
-        logging.StreamHandler()
-    ]
-)
+import logging.handlers
+import queue
+import time
+from config import Config
+
+
+def setup_logging():
+    """La boucle asyncio ne fait que poser les records dans une queue; un thread écrit fichier et console"""
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.handlers.RotatingFileHandler(
+        Config.LOG_FILE, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUPS, encoding='utf-8'
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    # vide la queue avant la sortie du process
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(Config.LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(records))
+
+
+# les workers spawn (vérification audio) réimportent ce module sous __mp_main__: seul le parent écrit le log
+if __name__ != '__mp_main__':
+    setup_logging()
 
 logger = logging.getLogger(__name__)
-downloader = PlaylistDownloader()
+_downloader = None
+
+
+def get_downloader():
+    """Créé au premier usage: --help, une erreur d'argument ou un prompt ne paient pas les imports lourds"""
+    global _downloader
+    if _downloader is None:
+        from services.playlist_downloader import PlaylistDownloader
+        _downloader = PlaylistDownloader()
+    return _downloader
+
+
+async def close_downloader():
+    if _downloader is not None:
+        await _downloader.close()
 
 
 async def spotify_playlist_download():
     playlist_url = input("enter a public spotify playlist url: ").strip()
     if not playlist_url:
         print("playlist URL required")
-    results = await downloader.extract_spotify_metadata(playlist_url)
-    return results
+    # les recherches démarrent dès la première page de la playlist
+    downloader = get_downloader()
+    await run_download(downloader.stream_download(downloader.iter_spotify_tracks(playlist_url), source=playlist_url))
 
 async def bandcamp_likes_download():
     cookie = input("enter your bandcamp cookie: ")
-    results = await downloader.get_bandcamp_likes_metadata(cookie)
-    return results
+    downloader = get_downloader()
+    if Config.ALBUM_MODE:
+        # une recherche par album, les tracks manquantes repassent en recherche individuelle
+        tracks = downloader.iter_bandcamp_albums(cookie)
+    else:
+        tracks = downloader.iter_bandcamp_likes(cookie)
+    await run_download(downloader.stream_download(tracks, source="bandcamp likes"))
+
+async def resume_job():
+    job_id = input("enter the job id to resume: ").strip()
+    try:
+        await run_download(get_downloader().resume(job_id))
+    except ValueError as e:
+        print(e)
 
-def get_result(playlist, download_result):
-    successful = sum(1 for r in download_result if r['success'])
-    print(f"done! found {successful}/{len(playlist)} tracks")
+async def run_download(results):
+    total = 0
+    successful = 0
+    files = 0
+    downloaded_bytes = 0
+    started = time.monotonic()
+    async for result in results:
+        total += 1
+        if result['success']:
+            successful += 1
+            files += result.get('files', 0)
+            downloaded_bytes += result.get('bytes', 0)
+    get_result(successful, total, files, downloaded_bytes, time.monotonic() - started)
+
+def get_result(successful, total, files=0, downloaded_bytes=0, elapsed=0):
+    print(f"done! found {successful}/{total} tracks")
+    if files:
+        mb = downloaded_bytes / 1024 / 1024
+        print(f"completed {files} files, {mb:.1f} MB in {elapsed:.0f}s ({mb / max(elapsed, 1):.2f} MB/s)")
 
 async def main():
     while True:
+        is_resume = input("resume an interrupted job?: y/n - ").strip().lower()
+        if is_resume == "y":
+            await resume_job()
+
         is_spotify_playlist = input("spotify playlist download?: y/n - ").strip().lower()
         if is_spotify_playlist == "y":
-            spotify_playlist = await spotify_playlist_download()
-            result = await downloader.download_playlist(spotify_playlist)
-            get_result(spotify_playlist, result)
+            await spotify_playlist_download()
 
         is_bandcamp_likes = input("bandcamp likes download?: y/n - ").strip().lower()
         if is_bandcamp_likes == "y":
-            bandcamp_playlist = await bandcamp_likes_download()
-            # print(bandcamp_playlist)
-            result = await downloader.download_playlist(bandcamp_playlist)
-            get_result(bandcamp_playlist, result)
+            await bandcamp_likes_download()
 
         is_done = input("anything else?: y/n - ").strip().lower()
         if is_done == "n":
             print("farewell, friend.")
             break
 
+    await close_downloader()
+
+async def headless(args):
+    try:
+        if args.command == 'jobs':
+            list_jobs(args.limit)
+            return
+
+        if args.command == 'resume':
+            await run_download(get_downloader().resume(args.job_id))
+            return
+
+        if args.command == 'fetch':
+            artist, _, title = args.track.partition(' - ')
+            if not title:
+                print("expected \"artist - title\"")
+                return
+            await run_download(get_downloader().stream_download([{'artist': artist, 'title': title}],
+                                                                source=args.track))
+            return
+
+        if args.command == 'serve':
+            from services.job_server import JobServer
+            await JobServer(get_downloader()).serve(args.host, args.port)
+            return
+
+        from services.sync_runner import SyncRunner, load_sources
+        # sources validées avant de créer les clients
+        sync_config = load_sources(args.sources)
+        runner = SyncRunner(get_downloader(), sync_config['sources'],
+                            interval=args.interval or sync_config['interval'])
+        if args.watch:
+            await runner.watch()
+        else:
+            await runner.run_once()
+    finally:
+        await close_downloader()
+
+def list_jobs(limit: int):
+    # le journal seul suffit: pas de client spotify / slskd, pas de validation des identifiants
+    from services.job_journal import JobJournal
+    for job_id, source, created_at, tracks, completed in JobJournal().list_jobs(limit):
+        started = time.strftime('%Y-%m-%d %H:%M', time.localtime(created_at))
+        print(f"{job_id}  {started}  {completed or 0}/{tracks} completed  {source or ''}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="soulseek playlist downloader (interactive without arguments)")
+    commands = parser.add_subparsers(dest='command')
+
+    sync = commands.add_parser('sync', help="sync every source of a YAML/JSON file")
+    sync.add_argument('sources', help="YAML or JSON file listing spotify playlists / bandcamp cookies")
+    sync.add_argument('--watch', action='store_true', help="keep running and re-poll sources on an interval")
+    sync.add_argument('--interval', type=float, help="seconds between two passes in watch mode")
+
+    resume = commands.add_parser('resume', help="resume an interrupted job")
+    resume.add_argument('job_id')
+
+    jobs = commands.add_parser('jobs', help="list recent jobs from the journal")
+    jobs.add_argument('--limit', type=int, default=20)
+
+    fetch = commands.add_parser('fetch', help="download a single track")
+    fetch.add_argument('track', help='"artist - title"')
+
+    serve = commands.add_parser('serve', help="run the http job server (jobs share one slskd session)")
+    serve.add_argument('--host', help=f"listen address (default {Config.SERVER_HOST})")
+    serve.add_argument('--port', type=int, help=f"listen port (default {Config.SERVER_PORT})")
+
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.command:
+        asyncio.run(headless(args))
+    else:
+        asyncio.run(main())
 
 
 
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# kbps, index 1..14 (0 = free, 15 = invalide); [mpeg1][layer] / [mpeg2][layer]
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def probe(path: str) -> dict:
+    """Format, durée (s) et débit moyen (kbps) lus dans les en-têtes, sans décoder l'audio"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError("empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = _skip_id3v2(mm)
+            if mm[start:start + 4] == b'fLaC':
+                info = _probe_flac(mm, start)
+            else:
+                info = _probe_mp3(mm, start, size)
+    info['size'] = size
+    if info['duration']:
+        info['bitrate'] = size * 8 / info['duration'] / 1000
+    return info
+
+
+def _skip_id3v2(mm) -> int:
+    if mm[:3] != b'ID3' or len(mm) < 10:
+        return 0
+    # taille "syncsafe" sur 4 x 7 bits, + 10 octets d'en-tête (+10 si footer)
+    tag_size = (mm[6] << 21) | (mm[7] << 14) | (mm[8] << 7) | mm[9]
+    return 10 + tag_size + (10 if mm[5] & 0x10 else 0)
+
+
+def _probe_flac(mm, start: int) -> dict:
+    offset = start + 4
+    while offset + 4 <= len(mm):
+        header = mm[offset]
+        length = int.from_bytes(mm[offset + 1:offset + 4], 'big')
+        if header & 0x7F == 0:
+            info = mm[offset + 4:offset + 4 + length]
+            # STREAMINFO: 20 bits sample rate, 3 bits canaux, 5 bits bps, 36 bits d'échantillons
+            packed = int.from_bytes(info[10:18], 'big')
+            sample_rate = packed >> 44
+            total_samples = packed & 0xFFFFFFFFF
+            if not sample_rate:
+                raise ValueError("invalid flac streaminfo")
+            return {'format': 'flac', 'duration': total_samples / sample_rate, 'sample_rate': sample_rate}
+        if header & 0x80:
+            break
+        offset += 4 + length
+    raise ValueError("flac streaminfo not found")
+
+
+def _probe_mp3(mm, start: int, size: int) -> dict:
+    offset = mm.find(b'\xff', start)
+    # on cherche la première trame valide dans les 64 premiers Ko après le tag
+    limit = min(size - 4, start + 65536)
+    while 0 <= offset < limit:
+        frame = _mp3_frame(mm[offset:offset + 4])
+        if frame is not None:
+            break
+        offset = mm.find(b'\xff', offset + 1)
+    else:
+        raise ValueError("no mp3 frame found")
+
+    frames = _xing_frames(mm, offset, frame) or _vbri_frames(mm, offset)
+    audio_bytes = size - offset - (128 if mm[size - 128:size - 125] == b'TAG' else 0)
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+    else:
+        # CBR: la taille suffit, une troncature raccourcit directement la durée calculée
+        duration = audio_bytes * 8 / (frame['bitrate'] * 1000)
+    return {'format': 'mp3', 'duration': duration, 'sample_rate': frame['sample_rate'],
+            'vbr': bool(frames), 'frame_bitrate': frame['bitrate']}
+
+
+def _mp3_frame(header: bytes):
+    if len(header) < 4:
+        return None
+    value = struct.unpack('>I', header)[0]
+    if value >> 21 != 0x7FF:
+        return None
+    version_bits = (value >> 19) & 3
+    layer_bits = (value >> 17) & 3
+    bitrate_index = (value >> 12) & 0xF
+    rate_index = (value >> 10) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    mpeg1 = version_bits == 3
+    samples = 384 if layer == 1 else (1152 if mpeg1 or layer == 2 else 576)
+    return {
+        'mpeg1': mpeg1,
+        'mono': (value >> 6) & 3 == 3,
+        'bitrate': MP3_BITRATES[(1 if mpeg1 else 2, layer)][bitrate_index],
+        'sample_rate': MP3_SAMPLE_RATES[version_bits][rate_index],
+        'samples': samples,
+    }
+
+
+def _xing_frames(mm, offset: int, frame: dict):
+    side_info = (17 if frame['mono'] else 32) if frame['mpeg1'] else (9 if frame['mono'] else 17)
+    position = offset + 4 + side_info
+    if mm[position:position + 4] not in (b'Xing', b'Info'):
+        return None
+    flags = int.from_bytes(mm[position + 4:position + 8], 'big')
+    if not flags & 1:
+        return None
+    return int.from_bytes(mm[position + 8:position + 12], 'big')
+
+
+def _vbri_frames(mm, offset: int):
+    position = offset + 4 + 32
+    if mm[position:position + 4] != b'VBRI':
+        return None
+    return int.from_bytes(mm[position + 14:position + 18], 'big')
+
+
+def verify_file(path: str, expected_ms: int = None, expected_bitrate: int = None,
+                expected_size: int = None) -> dict:
+    """Exécuté dans le process pool; ne lève pas, renvoie {'ok', 'reason', ...}"""
+    try:
+        info = probe(path)
+    except (OSError, ValueError) as e:
+        return {'ok': False, 'reason': f"unreadable: {e}", 'path': path}
+
+    result = {'ok': True, 'reason': None, 'path': path, **info}
+    if expected_size and info['size'] < expected_size:
+        result.update(ok=False, reason=f"truncated: {info['size']}/{expected_size} bytes")
+    elif expected_ms and abs(info['duration'] - expected_ms / 1000) > Config.VERIFY_DURATION_TOLERANCE:
+        result.update(ok=False, reason=f"duration {info['duration']:.0f}s, expected {expected_ms / 1000:.0f}s")
+    elif (info['format'] == 'mp3' and expected_bitrate and info.get('bitrate')
+          and info['bitrate'] < expected_bitrate * Config.VERIFY_MIN_BITRATE_RATIO):
+        result.update(ok=False, reason=f"bitrate {info['bitrate']:.0f} kbps, advertised {expected_bitrate}")
+    return result
+
+
+def local_path(filename: str, root: Path = None):
+    """slskd range chaque fichier dans un dossier au nom du dossier distant"""
+    root = Path(root or Config.DOWNLOAD_DIR)
+    parts = [p for p in re.split(r'[\\/]', filename) if p]
+    for candidate in (root.joinpath(*parts[-2:]), root / parts[-1]):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+class AudioVerifier:
+    """Vérifie en parallèle (process pool) les fichiers terminés avant de compter le téléchargement comme réussi"""
+
+    def __init__(self, workers: int = None, root: Path = None):
+        self.workers = workers or Config.VERIFY_WORKERS
+        self.root = root
+        self._pool = None
+
+    async def verify(self, track: dict, file: dict) -> dict:
+        path = local_path(file['filename'], self.root)
+        if path is None:
+            # DOWNLOAD_DIR n'est pas forcément le dossier de slskd: on ne bloque pas le téléchargement
+            logger.debug("not verified, file not found locally: %s", file['filename'])
+            return {'ok': True, 'reason': 'not found locally', 'path': None}
+
+        if self._pool is None:
+            # spawn: le process a déjà des threads (listener de logs, to_thread), un fork pourrait bloquer
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool, verify_file, str(path), track.get('duration_ms'), file.get('bitRate'), file.get('size')
+        )
+
+    def reject(self, result: dict):
+        """Le fichier refusé est renommé pour que le scan de la bibliothèque ne le compte pas"""
+        if result.get('path'):
+            try:
+                os.replace(result['path'], f"{result['path']}.rejected")
+            except OSError as e:
+                logger.warning(f"could not rename rejected file {result['path']}: {e}")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,142 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from config import Config
+from services.library_index import track_key
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+SEARCHED = 'searched'
+ENQUEUED = 'enqueued'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    track_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    data TEXT,
+    at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS job_tracks (
+    job_id TEXT NOT NULL,
+    track_key TEXT NOT NULL,
+    track TEXT NOT NULL,
+    state TEXT NOT NULL,
+    data TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, track_key)
+);
+"""
+
+
+class JobJournal:
+    """Journal append-only des transitions de chaque track, pour reprendre un run interrompu"""
+
+    def __init__(self, db_path: str = None, commit_interval: float = None):
+        self.db_path = db_path or Config.JOURNAL_DB
+        self.commit_interval = Config.JOURNAL_COMMIT_INTERVAL if commit_interval is None else commit_interval
+        self._lock = threading.Lock()
+        self._committed_at = time.monotonic()
+        self._pending = 0
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL + NORMAL: chaque commit survit à un crash ou un Ctrl-C du process
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        # appelé sous self._lock
+        if self._pending:
+            self.db.commit()
+            self._pending = 0
+        self._committed_at = time.monotonic()
+
+    def create_job(self, source: str = None) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.db.execute("INSERT INTO jobs (id, source, created_at) VALUES (?, ?, ?)",
+                            (job_id, source, time.time()))
+            self.db.commit()
+        return job_id
+
+    def record(self, job_id: str, track: dict, state: str, **data):
+        key = journal_key(track)
+        now = time.time()
+        payload = json.dumps(data) if data else None
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO events (job_id, track_key, state, data, at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, key, state, payload, now)
+            )
+            self.db.execute(
+                """INSERT INTO job_tracks (job_id, track_key, track, state, data, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (job_id, track_key) DO UPDATE SET
+                       state = excluded.state,
+                       data = COALESCE(excluded.data, data),
+                       updated_at = excluded.updated_at""",
+                (job_id, key, json.dumps(_clean(track)), state, payload, now)
+            )
+            # un commit par transition bloquait la boucle asyncio; un crash perd au plus le dernier lot,
+            # que la reprise refait
+            self._pending += 1
+            if time.monotonic() - self._committed_at >= self.commit_interval:
+                self._commit()
+
+    def job_exists(self, job_id: str) -> bool:
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is not None
+
+    def job_source(self, job_id: str):
+        with self._lock:
+            row = self.db.execute("SELECT source FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def job_tracks(self, job_id: str) -> list:
+        """[(track, dernier état, données du dernier état)] dans l'ordre d'arrivée"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT track, state, data FROM job_tracks WHERE job_id = ? ORDER BY rowid", (job_id,)
+            ).fetchall()
+        return [(json.loads(track), state, json.loads(data) if data else {}) for track, state, data in rows]
+
+    def list_jobs(self, limit: int = 20) -> list:
+        with self._lock:
+            return self.db.execute(
+                """SELECT j.id, j.source, j.created_at,
+                          COUNT(t.track_key), SUM(t.state = ?)
+                   FROM jobs j LEFT JOIN job_tracks t ON t.job_id = j.id
+                   GROUP BY j.id ORDER BY j.created_at DESC LIMIT ?""",
+                (COMPLETED, limit)
+            ).fetchall()
+
+
+def journal_key(track: dict) -> str:
+    return track.get('spotify_id') or track_key(track)
+
+
+def _clean(track: dict) -> dict:
+    return {k: v for k, v in track.items() if not k.startswith('_')}
@@ -0,0 +1,238 @@
+import asyncio
+import json
+from collections import deque
+import logging
+import time
+
+from aiohttp import web
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+# événements gardés par job pour les abonnés tardifs; les compteurs de summary() restent complets
+EVENTS_TAIL = 500
+
+
+class Job:
+    def __init__(self, job_id: str, source: str):
+        self.id = job_id
+        self.source = source
+        self.status = RUNNING
+        self.created_at = time.time()
+        self.counts = {'tracks': 0, 'successful': 0, 'skipped': 0, 'failed': 0}
+        self.error = None
+        self.events = deque(maxlen=EVENTS_TAIL)
+        self.subscribers = set()
+        self.task = None
+
+    def publish(self, event: dict):
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def summary(self) -> dict:
+        return {'id': self.id, 'source': self.source, 'status': self.status, 'created_at': self.created_at,
+                'counts': self.counts, 'error': self.error}
+
+
+class JobServer:
+    """API HTTP autour d'un seul PlaylistDownloader: tous les jobs partagent la session slskd,
+    le scheduler de recherches, les caches et le monitor de transferts"""
+
+    def __init__(self, downloader, token: str = None):
+        self.downloader = downloader
+        self.token = token if token is not None else Config.SERVER_TOKEN
+        self.jobs = {}
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._auth])
+        app.add_routes([
+            web.get('/jobs', self.list_jobs),
+            web.post('/jobs', self.create_job),
+            web.get('/jobs/{id}', self.get_job),
+            web.delete('/jobs/{id}', self.cancel_job),
+            web.get('/jobs/{id}/events', self.job_events),
+            web.get('/jobs/{id}/ws', self.job_socket),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    async def serve(self, host: str = None, port: int = None):
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        host = host or Config.SERVER_HOST
+        port = port or Config.SERVER_PORT
+        await web.TCPSite(runner, host, port).start()
+        print(f"🛰️ job server listening on http://{host}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    @web.middleware
+    async def _auth(self, request, handler):
+        if self.token and request.headers.get('Authorization') != f"Bearer {self.token}":
+            raise web.HTTPUnauthorized(text="missing or invalid bearer token")
+        return await handler(request)
+
+    async def _on_startup(self, app):
+        # une seule connexion, ouverte avant le premier job
+        await self.downloader.soulseek.connect()
+
+    async def _on_shutdown(self, app):
+        for job in self.jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        await asyncio.gather(*(job.task for job in self.jobs.values() if job.task), return_exceptions=True)
+        await self.downloader.close()
+
+    # routes
+
+    async def list_jobs(self, request):
+        return web.json_response([job.summary() for job in self.jobs.values()])
+
+    async def create_job(self, request):
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="json body expected")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="json object expected")
+
+        try:
+            job_id, source, tracks = self._source(body)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+        running = self.jobs.get(job_id)
+        if running is not None and running.task is not None and not running.task.done():
+            # resume d'un job en cours: deux pipelines sur le même job du journal, le premier plus annulable
+            raise web.HTTPConflict(text=f"job {job_id} is still running")
+
+        job = Job(job_id, source)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, tracks))
+        return web.json_response(job.summary(), status=201)
+
+    async def get_job(self, request):
+        return web.json_response(self._job(request).summary())
+
+    async def cancel_job(self, request):
+        job = self._job(request)
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+        return web.json_response(job.summary())
+
+    async def job_events(self, request):
+        """Server-sent events: les événements déjà passés puis le direct, jusqu'à la fin du job"""
+        job = self._job(request)
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        async for event in self._follow(job):
+            await response.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+        return response
+
+    async def job_socket(self, request):
+        job = self._job(request)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        async for event in self._follow(job):
+            if ws.closed:
+                break
+            await ws.send_json(event)
+        await ws.close()
+        return ws
+
+    # jobs
+
+    def _source(self, body: dict) -> tuple:
+        kind = body.get('type')
+        journal = self.downloader.journal
+        if kind == 'spotify':
+            if not body.get('url'):
+                raise ValueError("spotify job needs a url")
+            source = f"spotify {body['url']}"
+            return journal.create_job(source), source, self.downloader.iter_spotify_tracks(body['url'])
+        if kind == 'bandcamp':
+            if not body.get('cookie'):
+                raise ValueError("bandcamp job needs a cookie")
+            albums = body.get('album_mode', Config.ALBUM_MODE)
+            tracks = (self.downloader.iter_bandcamp_albums if albums else self.downloader.iter_bandcamp_likes)(
+                body['cookie'])
+            return journal.create_job('bandcamp likes'), 'bandcamp likes', tracks
+        if kind == 'resume':
+            if not journal.job_exists(body.get('job_id') or ''):
+                raise ValueError(f"unknown job id: {body.get('job_id')}")
+            return body['job_id'], f"resume {body['job_id']}", None
+        raise ValueError(f"unknown job type: {kind!r}")
+
+    async def _run(self, job: Job, tracks):
+        if tracks is None:
+            results = self.downloader.resume(job.id)
+        else:
+            results = self.downloader.stream_download(tracks, job_id=job.id, source=job.source)
+
+        try:
+            async for result in results:
+                job.counts['tracks'] += 1
+                job.counts['successful'] += bool(result['success'])
+                job.counts['skipped'] += bool(result.get('skipped'))
+                job.counts['failed'] += not result['success']
+                job.publish(_track_event(result))
+            job.status = DONE
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"job {job.id} error: {e}")
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            # arrête le pipeline tout de suite (tâches de recherche, transferts suivis)
+            await results.aclose()
+            job.publish({'type': 'done', **job.summary()})
+
+    async def _follow(self, job: Job):
+        queue = asyncio.Queue()
+        # abonnement et copie de l'historique sans await entre les deux: ni trou ni doublon
+        job.subscribers.add(queue)
+        backlog = list(job.events)
+        try:
+            for event in backlog:
+                yield event
+                if event['type'] == 'done':
+                    return
+            while True:
+                event = await queue.get()
+                yield event
+                if event['type'] == 'done':
+                    return
+        finally:
+            job.subscribers.discard(queue)
+
+    def _job(self, request) -> Job:
+        job = self.jobs.get(request.match_info['id'])
+        if job is None:
+            raise web.HTTPNotFound(text="unknown job id")
+        return job
+
+
+def _track_event(result: dict) -> dict:
+    track = result.get('track') or {}
+    event = {
+        'type': 'track',
+        'artist': track.get('artist'),
+        'title': track.get('title'),
+        'success': result['success'],
+        'skipped': bool(result.get('skipped')),
+        'shared': bool(result.get('shared')),
+    }
+    if result.get('error'):
+        event['error'] = result['error']
+    if result.get('bytes'):
+        event['bytes'] = result['bytes']
+    return event
@@ -0,0 +1,216 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.m4a', '.ogg', '.opus', '.wav', '.aiff', '.alac')
+
+# seul statut qui dispense d'une nouvelle recherche: un fichier 'enqueued' sans monitor a pu échouer,
+# et s'il a abouti le scan du disque le retrouve
+KNOWN_STATUS = 'completed'
+# part minimale des mots du nom de fichier (hors artiste) que le titre doit couvrir
+MIN_TITLE_COVERAGE = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    key TEXT PRIMARY KEY,
+    spotify_id TEXT,
+    artist TEXT,
+    title TEXT,
+    path TEXT,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_spotify_id ON tracks (spotify_id);
+
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+
+class LibraryIndex:
+    """Index SQLite de ce qui a déjà été récupéré sous DOWNLOAD_DIR"""
+
+    def __init__(self, db_path: str = None, root: Path = None):
+        self.db_path = db_path or Config.LIBRARY_DB
+        self.root = Path(root or Config.DOWNLOAD_DIR)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def scan(self) -> int:
+        """Scan incrémental: les dossiers dont le mtime n'a pas bougé ne sont pas relus.
+        Le lock n'est pris que pour les écritures d'un dossier, pas pendant le parcours du disque"""
+        started = time.monotonic()
+        scanned = 0
+
+        with self._lock:
+            known_folders = dict(self.db.execute("SELECT path, mtime FROM folders"))
+        seen_folders = set()
+
+        for folder, mtime in self._walk_folders(self.root):
+            seen_folders.add(folder)
+            if known_folders.get(folder) == mtime:
+                continue
+            scanned += 1
+            self._scan_folder(folder, mtime)
+
+        with self._lock:
+            for folder in set(known_folders) - seen_folders:
+                self.db.execute("DELETE FROM folders WHERE path = ?", (folder,))
+                self.db.execute("DELETE FROM files WHERE folder = ?", (folder,))
+            self.db.commit()
+
+        logger.info(f"library scan: {scanned} changed folders in {time.monotonic() - started:.2f}s")
+        return scanned
+
+    def _walk_folders(self, root: Path):
+        if not root.exists():
+            return
+        stack = [str(root)]
+        while stack:
+            folder = stack.pop()
+            try:
+                mtime = os.stat(folder).st_mtime
+                with os.scandir(folder) as entries:
+                    subfolders = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+            except OSError as e:
+                logger.warning(f"library scan error {folder}: {e}")
+                continue
+            stack.extend(subfolders)
+            yield folder, mtime
+
+    def _scan_folder(self, folder: str, folder_mtime: float):
+        with self._lock:
+            known = {path: (mtime, size) for path, mtime, size in
+                     self.db.execute("SELECT path, mtime, size FROM files WHERE folder = ?", (folder,))}
+        present = set()
+        changed = []
+        normalized_folder = normalize_text(os.path.relpath(folder, self.root))
+
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        continue
+                    stat = entry.stat()
+                    present.add(entry.path)
+                    if known.get(entry.path) == (stat.st_mtime, stat.st_size):
+                        continue
+                    changed.append((entry.path, folder, f"{normalized_folder} {normalize_filename(entry.name)}",
+                                    stat.st_mtime, stat.st_size))
+        except OSError as e:
+            logger.warning(f"library scan error {folder}: {e}")
+            return
+
+        with self._lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO files (path, folder, name, mtime, size) VALUES (?, ?, ?, ?, ?)", changed
+            )
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in set(known) - present])
+            self.db.execute("INSERT OR REPLACE INTO folders (path, mtime) VALUES (?, ?)", (folder, folder_mtime))
+            self.db.commit()
+
+    def lookup(self, track: dict):
+        """Renvoie le statut connu de la track, ou None s'il faut la chercher (appelé via asyncio.to_thread)"""
+        with self._lock:
+            if track.get('spotify_id'):
+                row = self.db.execute(
+                    "SELECT status, path FROM tracks WHERE spotify_id = ? AND status = ?",
+                    (track['spotify_id'], KNOWN_STATUS)
+                ).fetchone()
+                if row:
+                    return {'status': row[0], 'path': row[1]}
+
+            row = self.db.execute(
+                "SELECT status, path FROM tracks WHERE key = ? AND status = ?",
+                (track_key(track), KNOWN_STATUS)
+            ).fetchone()
+            if row:
+                return {'status': row[0], 'path': row[1]}
+
+            path = self._find_on_disk(track)
+
+        if path:
+            self.mark(track, 'completed', path)
+            return {'status': 'completed', 'path': path}
+        return None
+
+    def _find_on_disk(self, track: dict):
+        """Titre en mots entiers dans le nom du fichier et couvrant au moins MIN_TITLE_COVERAGE de ses mots
+        hors artiste ("One" ne matche ni "Introspection" ni "One More Time"), artiste dans le chemin"""
+        title = normalize_text(strip_version(track['title']))
+        artist = normalize_text(track['artist'].split(',')[0])
+        if not title:
+            return None
+
+        rows = self.db.execute(
+            "SELECT path, name FROM files WHERE name LIKE ?", (f"%{title}%",)
+        ).fetchall()
+        for path, name in rows:
+            if artist and f" {artist} " not in f" {name} ":
+                continue
+            stem = normalize_filename(os.path.basename(path))
+            if f" {title} " not in f" {stem} ":
+                continue
+            words = [w for w in stem.split() if w not in artist.split()]
+            if len(title.split()) >= MIN_TITLE_COVERAGE * len(words):
+                return path
+        return None
+
+    def mark(self, track: dict, status: str, path: str = None):
+        with self._lock:
+            self.db.execute(
+                """INSERT INTO tracks (key, spotify_id, artist, title, path, status, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                       spotify_id = COALESCE(excluded.spotify_id, spotify_id),
+                       path = COALESCE(excluded.path, path),
+                       status = excluded.status,
+                       updated_at = excluded.updated_at""",
+                (track_key(track), track.get('spotify_id'), track['artist'], track['title'],
+                 path, status, time.time())
+            )
+            self.db.commit()
+
+
+def normalize_text(text: str) -> str:
+    text = ''.join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[\W_]+', ' ', text.lower()).split())
+
+
+def normalize_filename(filename: str) -> str:
+    stem = os.path.splitext(filename)[0]
+    # "01 - ", "1-03 " etc.
+    stem = re.sub(r'^\s*\d{1,3}([\s._-]+\d{1,3})?[\s._-]+', '', stem)
+    return normalize_text(stem)
+
+
+def track_key(track: dict) -> str:
+    return f"{normalize_text(track['artist'])}|{normalize_text(track['title'])}"
+
+
+def strip_version(title: str) -> str:
+    return re.sub(r'\s+[-(\[].*$', '', title).strip() or title
@@ -0,0 +1,159 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# bornes des buckets prometheus: secondes pour les durées, nombres pour les distributions (polls, réponses...)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120, 300, 600, float('inf'))
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+RESERVOIR_SIZE = 2048
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.bounds = buckets
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * len(buckets)
+        # échantillon borné pour les quantiles du résumé
+        self.reservoir = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+        if len(self.reservoir) < RESERVOIR_SIZE:
+            self.reservoir.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.reservoir[slot] = value
+
+    def quantile(self, q: float) -> float:
+        if not self.reservoir:
+            return 0.0
+        ordered = sorted(self.reservoir)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """Histogrammes de durées et compteurs par étape (spotify, recherche, classement, enqueue, transfert),
+    plus des distributions de nombres (polls, réponses, fichiers par recherche)"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.distributions = {}
+        self.counters = {}
+        self.started = time.monotonic()
+
+    def observe(self, name: str, value: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def observe_count(self, name: str, value: float):
+        distribution = self.distributions.get(name)
+        if distribution is None:
+            distribution = self.distributions[name] = Histogram(COUNT_BUCKETS)
+        distribution.observe(value)
+
+    def inc(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str):
+        """Utilisable autour de code async: with metrics.timer('x'): await ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def reset(self):
+        self.histograms.clear()
+        self.distributions.clear()
+        self.counters.clear()
+        self.started = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            'uptime_seconds': time.monotonic() - self.started,
+            'counters': dict(self.counters),
+            'histograms': {name: h.to_dict() for name, h in self.histograms.items()},
+            'distributions': {name: d.to_dict() for name, d in self.distributions.items()},
+        }
+
+    def summary_table(self) -> str:
+        lines = [f"{'stage':<28}{'count':>8}{'sum':>10}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}"]
+        for name in sorted(self.histograms):
+            h = self.histograms[name]
+            mean = h.sum / h.count if h.count else 0
+            lines.append(f"{name:<28}{h.count:>8}{h.sum:>10.2f}{mean:>9.3f}"
+                         f"{h.quantile(0.5):>9.3f}{h.quantile(0.95):>9.3f}{h.max:>9.3f}")
+        if self.distributions:
+            lines.append("")
+            lines.append(f"{'per search':<28}{'count':>8}{'sum':>10}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}")
+            for name in sorted(self.distributions):
+                d = self.distributions[name]
+                mean = d.sum / d.count if d.count else 0
+                lines.append(f"{name:<28}{d.count:>8}{d.sum:>10g}{mean:>9.1f}"
+                             f"{d.quantile(0.5):>9g}{d.quantile(0.95):>9g}{d.max:>9g}")
+        if self.counters:
+            lines.append("")
+            for name in sorted(self.counters):
+                lines.append(f"{name:<28}{self.counters[name]:>8g}")
+        return '\n'.join(lines)
+
+    def to_prometheus(self, prefix: str = 'slsk') -> str:
+        lines = []
+        for name in sorted(self.counters):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {self.counters[name]}")
+        for name, h in sorted({**self.histograms, **self.distributions}.items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(h.bounds, h.buckets):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum {h.sum}")
+            lines.append(f"{metric}_count {h.count}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str):
+        """.json -> snapshot JSON, sinon format texte prometheus (node_exporter textfile)"""
+        target = Path(path)
+        content = json.dumps(self.snapshot(), indent=2) if target.suffix == '.json' else self.to_prometheus()
+        tmp = target.with_suffix(target.suffix + '.tmp')
+        tmp.write_text(content, encoding='utf-8')
+        tmp.replace(target)
+        logger.info(f"metrics written to {target}")
+
+
+metrics = Metrics()
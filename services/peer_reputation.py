@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import threading
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS peers (
+    username TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    transfer_seconds REAL NOT NULL DEFAULT 0,
+    queue_seconds REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+COLUMNS = ('attempts', 'completed', 'failed', 'rejected', 'bytes', 'transfer_seconds', 'queue_seconds')
+
+
+class PeerReputation:
+    """Statistiques par peer gardées d'un run à l'autre: vitesse réelle, attente en queue, taux de réussite"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.PEER_DB
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        # quelques milliers de peers au plus: tout tient en mémoire pour le classement
+        self.peers = {
+            row[0]: dict(zip(COLUMNS, row[1:]))
+            for row in self.db.execute(f"SELECT username, {', '.join(COLUMNS)} FROM peers")
+        }
+
+    def close(self):
+        self.db.close()
+
+    def record_transfer(self, outcome: dict):
+        """Issue d'un transfert suivi par le TransferMonitor"""
+        stats = {'attempts': 1}
+        if outcome['success']:
+            stats['completed'] = 1
+            stats['bytes'] = outcome.get('bytes') or 0
+            stats['transfer_seconds'] = max(0.0, outcome.get('elapsed', 0) - outcome.get('queue_seconds', 0))
+        else:
+            stats['failed'] = 1
+        stats['queue_seconds'] = outcome.get('queue_seconds', 0)
+        self._add(outcome['username'], stats)
+
+    def record_rejection(self, username: str):
+        """Enqueue refusé directement par le peer"""
+        self._add(username, {'attempts': 1, 'rejected': 1})
+
+    def success_rate(self, username: str) -> float:
+        peer = self.peers.get(username)
+        if peer is None:
+            return 0.5
+        # lissage de laplace: un seul échec ne condamne pas un peer
+        return (peer['completed'] + 1) / (peer['attempts'] + 2)
+
+    def is_bad(self, username: str) -> bool:
+        peer = self.peers.get(username)
+        return (peer is not None and peer['attempts'] >= Config.PEER_MIN_ATTEMPTS
+                and self.success_rate(username) < Config.PEER_BAD_SUCCESS_RATE)
+
+    def expected_seconds(self, candidate: dict) -> float:
+        """Temps estimé avant la fin du transfert: attente en queue + taille / vitesse"""
+        peer = self.peers.get(candidate['username'])
+        size = candidate['files'][0].get('size') or 0
+        speed = candidate.get('uploadSpeed') or 0
+        queue = 0.0 if candidate.get('hasFreeUploadSlot') else (candidate.get('queueLength') or 0) * 30.0
+
+        if peer is not None:
+            if peer['completed'] and peer['transfer_seconds'] > 0:
+                observed = peer['bytes'] / peer['transfer_seconds']
+                # la vitesse annoncée par soulseek est souvent optimiste
+                speed = observed if not speed else (observed + speed) / 2
+            if peer['attempts']:
+                queue = (queue + peer['queue_seconds'] / peer['attempts']) / 2
+
+        return queue + size / max(speed, 10_000)
+
+    def rerank(self, candidates: list) -> list:
+        """Retire les peers connus comme mauvais et pondère le score par la réussite et le temps attendu"""
+        kept = []
+        for candidate in candidates:
+            if self.is_bad(candidate['username']):
+                logger.debug("skipping known bad peer %s", candidate['username'])
+                continue
+            eta = self.expected_seconds(candidate)
+            weight = (0.6 + 0.4 * self.success_rate(candidate['username'])) / (1 + eta / Config.PEER_ETA_SCALE)
+            kept.append({**candidate, 'score': candidate['score'] * weight, 'match_score': candidate['score'],
+                         'expected_seconds': eta})
+        kept.sort(key=lambda c: c['score'], reverse=True)
+        return kept
+
+    def _add(self, username: str, stats: dict):
+        peer = self.peers.setdefault(username, dict.fromkeys(COLUMNS, 0))
+        for column, value in stats.items():
+            peer[column] += value
+
+        with self._lock:
+            self.db.execute(
+                f"""INSERT INTO peers (username, {', '.join(COLUMNS)}, updated_at)
+                    VALUES (?, {', '.join('?' * len(COLUMNS))}, ?)
+                    ON CONFLICT (username) DO UPDATE SET
+                    {', '.join(f'{c} = excluded.{c}' for c in COLUMNS)}, updated_at = excluded.updated_at""",
+                (username, *(peer[c] for c in COLUMNS), time.time())
+            )
+            self.db.commit()
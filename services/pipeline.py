@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class DownloadPipeline:
+    """source -> normalize/dedupe -> search workers -> rank -> enqueue workers, reliés par des queues bornées"""
+
+    def __init__(self, soulseek, search_workers: int, enqueue_workers: int, queue_size: int,
+                 library=None, monitor=None, max_transfers: int = 50, journal=None, job_id: str = None,
+                 coalescer=None):
+        self.soulseek = soulseek
+        self.coalescer = coalescer
+        self._followers = set()
+        # tracks déjà émises (id), pour ne pas doubler un résultat après une erreur en milieu d'album
+        self._reported = set()
+        self.library = library
+        self.monitor = monitor
+        self.journal = journal
+        self.job_id = job_id
+        self.max_transfers = max_transfers
+        self.search_workers = search_workers
+        self.enqueue_workers = enqueue_workers
+        self.queue_size = queue_size
+
+    async def run(self, source):
+        """Consomme un itérable (async ou non) de tracks et renvoie les résultats au fil de l'eau"""
+        track_queue = asyncio.Queue(self.queue_size)
+        enqueue_queue = asyncio.Queue(self.queue_size)
+        results = asyncio.Queue(self.queue_size)
+
+        producer = asyncio.create_task(self._produce(source, track_queue, results))
+        searchers = [asyncio.create_task(self._search_worker(track_queue, enqueue_queue, results))
+                     for _ in range(self.search_workers)]
+        enqueuers = [asyncio.create_task(self._enqueue_worker(enqueue_queue, results))
+                     for _ in range(self.enqueue_workers)]
+        closer = asyncio.create_task(self._close_stages(producer, searchers, enqueuers,
+                                                        track_queue, enqueue_queue, results))
+        tasks = [producer, *searchers, *enqueuers, closer]
+
+        try:
+            while True:
+                result = await results.get()
+                if result is _DONE:
+                    break
+                yield result
+            # remonte une éventuelle erreur de la source
+            await producer
+        finally:
+            for task in [*tasks, *self._followers]:
+                task.cancel()
+            await asyncio.gather(*tasks, *self._followers, return_exceptions=True)
+            if self.coalescer is not None:
+                self.coalescer.abandon(self)
+
+    async def _close_stages(self, producer, searchers, enqueuers, track_queue, enqueue_queue, results):
+        try:
+            await producer
+        except Exception as e:
+            logger.error(f"track source error: {e}")
+        finally:
+            for _ in searchers:
+                await track_queue.put(_DONE)
+        await asyncio.gather(*searchers, return_exceptions=True)
+
+        for _ in enqueuers:
+            await enqueue_queue.put(_DONE)
+        await asyncio.gather(*enqueuers, return_exceptions=True)
+
+        # doublons qui attendent encore le résultat d'une autre playlist
+        while self._followers:
+            await asyncio.gather(*self._followers, return_exceptions=True)
+
+        await results.put(_DONE)
+
+    async def _produce(self, source, track_queue, results):
+        seen = set()
+        async for item in _aiter(source):
+            if item and 'tracks' in item:
+                album = await self._filter_album(item, seen, results)
+                if album is None:
+                    continue
+                # un album réduit à une track repasse par la recherche classique
+                await track_queue.put(album if len(album['tracks']) > 1 else album['tracks'][0])
+                continue
+
+            track = await self._filter_track(item, seen, results)
+            if track is not None:
+                await track_queue.put(track)
+
+    async def _filter_track(self, track, seen, results):
+        track = self._normalize(track)
+        if track is None:
+            return None
+
+        if self.coalescer is None:
+            key = self._dedupe_key(track)
+            if key in seen:
+                logger.debug("duplicate skipped: %s - %s", track['artist'], track['title'])
+                return None
+            seen.add(key)
+
+        if self.library is not None:
+            # sqlite hors de la boucle: un scan en cours ne bloque pas les autres jobs
+            known = await asyncio.to_thread(self.library.lookup, track)
+            if known:
+                logger.debug("already in library (%s): %s - %s", known['status'], track['artist'], track['title'])
+                self._record(track, 'completed', skipped=True)
+                await results.put({'success': True, 'skipped': True, 'track': track,
+                                   'message': f"already in library ({known['status']})"})
+                return None
+
+        if self.coalescer is not None:
+            # join puis claim sans await entre les deux
+            shared = self.coalescer.join(track)
+            if shared is not None:
+                logger.debug("duplicate joined: %s - %s", track['artist'], track['title'])
+                follower = asyncio.create_task(self._follow(track, shared, results))
+                self._followers.add(follower)
+                follower.add_done_callback(self._followers.discard)
+                return None
+            self.coalescer.claim(track, owner=self)
+        self._record(track, 'queued')
+        return track
+
+    async def _follow(self, track, shared, results):
+        """Même track déjà en vol (cette playlist ou une autre): on reprend son résultat sans rechercher.
+        Si le job propriétaire est annulé, la track est cherchée ici (ou rattachée à un autre vol)"""
+        while True:
+            try:
+                result = await asyncio.shield(shared)
+                break
+            except asyncio.CancelledError:
+                if not shared.cancelled():
+                    raise
+
+            shared = self.coalescer.join(track)
+            if shared is None:
+                logger.debug("duplicate owner cancelled, searching: %s - %s", track['artist'], track['title'])
+                self.coalescer.claim(track, owner=self)
+                self._record(track, 'queued')
+                await self._fallback(track, results)
+                return
+
+        outcome = {'success': result['success'], 'shared': True}
+        if result['success']:
+            outcome['message'] = f"shared with {result['track']['artist']} - {result['track']['title']}"
+        else:
+            outcome['error'] = result.get('error')
+        await self._emit(track, outcome, results, searched=False)
+
+    async def _filter_album(self, album, seen, results):
+        tracks = []
+        for track in album['tracks']:
+            track = await self._filter_track(track, seen, results)
+            if track is not None:
+                tracks.append(track)
+        if not tracks:
+            return None
+        return {**album, 'tracks': tracks}
+
+    async def _search_worker(self, track_queue, enqueue_queue, results):
+        while True:
+            item = await track_queue.get()
+            if item is _DONE:
+                return
+
+            # un worker mort laisserait la track sans résultat (et son vol partagé jamais résolu)
+            try:
+                await self._search_item(item, enqueue_queue, results)
+            except Exception as e:
+                logger.error(f"search worker error: {e}")
+                await self._fail(item, str(e), results)
+
+    async def _search_item(self, item, enqueue_queue, results):
+        if 'tracks' in item:
+            await self._search_album(item, enqueue_queue, results)
+            return
+
+        if '_reattach' in item:
+            # repris depuis le journal: le transfert est peut-être encore en cours dans slskd
+            reattach = item['_reattach']
+            await enqueue_queue.put((item, [{
+                'username': reattach['username'],
+                'files': [{'filename': reattach['filename'], 'size': reattach.get('size', 0)}],
+                'reattach': True,
+            }]))
+            return
+
+        candidates = await self._search(item, results)
+        if candidates is not None:
+            await enqueue_queue.put((item, candidates))
+
+    async def _fail(self, item, error: str, results):
+        """Résultat en échec pour une track (ou chaque track d'un album) qu'une erreur inattendue a interrompue"""
+        for track in item['tracks'] if 'tracks' in item else (item,):
+            if id(track) in self._reported:
+                continue
+            try:
+                await self._emit(track, {'success': False, 'error': error}, results, searched=False)
+            except Exception as e:
+                logger.error(f"could not report failed track {track.get('artist')} - {track.get('title')}: {e}")
+                if self.coalescer is not None:
+                    self.coalescer.resolve(track, {'success': False, 'error': error, 'track': track}, owner=self)
+
+    async def _search(self, track, results):
+        """Recherche + classement; None si la track est déjà réglée (introuvable ou erreur)"""
+        try:
+            responses = await self.soulseek.search_track(track)
+        except Exception as e:
+            logger.error(f"search error: {e}")
+            await self._emit(track, {'success': False, 'error': str(e)}, results, searched=False)
+            return None
+
+        if len(responses) == 0:
+            print(f"🙀 {track['artist']} - {track['title']} - not found")
+            await self._emit(track, {'success': False, 'error': 'track not found'}, results, searched=False)
+            return None
+
+        candidates = self.soulseek.rank_candidates(track, responses)
+        if candidates:
+            self._record(track, 'searched', username=candidates[0]['username'],
+                         filename=candidates[0]['files'][0]['filename'], score=candidates[0]['score'])
+        return candidates
+
+    async def _search_album(self, album, enqueue_queue, results):
+        try:
+            responses = await self.soulseek.search_album(album)
+            plan = self.soulseek.rank_album(album, responses)
+        except Exception as e:
+            logger.error(f"album search error: {e}")
+            plan = None
+
+        await enqueue_queue.put((album, plan))
+
+    async def _enqueue_worker(self, enqueue_queue, results):
+        # chaque transfert suivi tourne dans sa propre tâche, bornée par max_transfers
+        slots = asyncio.Semaphore(max(1, self.max_transfers // self.enqueue_workers))
+        active = set()
+        try:
+            while True:
+                item = await enqueue_queue.get()
+                if item is _DONE:
+                    break
+
+                await slots.acquire()
+                task = asyncio.create_task(self._guarded_transfer(item, results))
+                active.add(task)
+                task.add_done_callback(lambda t: (active.discard(t), slots.release()))
+
+            await asyncio.gather(*active)
+        finally:
+            for task in active:
+                task.cancel()
+
+    async def _guarded_transfer(self, item, results):
+        try:
+            await self._transfer(*item, results)
+        except Exception as e:
+            logger.error(f"transfer error: {e}")
+            await self._fail(item[0], str(e), results)
+
+    async def _transfer(self, item, candidates, results):
+        if 'tracks' in item:
+            await self._transfer_album(item, candidates, results)
+            return
+
+        track = item
+        try:
+            result = await self.soulseek.download_candidates(track, candidates, monitor=self.monitor,
+                                                             on_enqueued=self._on_enqueued)
+        except Exception as e:
+            logger.error(f"enqueue error: {e}")
+            result = {'success': False, 'error': str(e)}
+
+        if not result['success'] and '_reattach' in track:
+            track = {k: v for k, v in track.items() if k != '_reattach'}
+            await self._fallback(track, results)
+            return
+
+        await self._emit(track, result, results, searched=bool(candidates))
+
+    async def _transfer_album(self, album, plan, results):
+        track_results = {}
+        if plan is not None:
+            try:
+                track_results = await self.soulseek.download_album(album, plan, monitor=self.monitor,
+                                                                   on_enqueued=self._on_enqueued)
+            except Exception as e:
+                logger.error(f"album enqueue error: {e}")
+
+        # les trous (pas dans le dossier, ou transfert échoué) repassent en recherche par track
+        fallbacks = []
+        for i, track in enumerate(album['tracks']):
+            result = track_results.get(i)
+            if result is not None:
+                await self._emit(track, result, results)
+            else:
+                fallbacks.append(self._fallback(track, results))
+        await asyncio.gather(*fallbacks)
+
+    async def _fallback(self, track, results):
+        candidates = await self._search(track, results)
+        if candidates is not None:
+            await self._transfer(track, candidates, results)
+
+    def _on_enqueued(self, track, candidate, transfers):
+        filename = candidate['files'][0]['filename']
+        transfer_id = next((t.get('id') for t in transfers if t.get('filename') == filename), None)
+        self._record(track, 'enqueued', username=candidate['username'], filename=filename,
+                     size=candidate['files'][0].get('size', 0), transfer_id=transfer_id)
+
+    def _record(self, track, state, **data):
+        if self.journal is not None:
+            self.journal.record(self.job_id, track, state, **data)
+
+    async def _emit(self, track, result, results, searched: bool = True):
+        result['track'] = track
+        transfer = result.get('transfer') or {}
+        if result['success']:
+            self._record(track, 'completed', transfer_id=transfer.get('id'), bytes=result.get('bytes', 0))
+        else:
+            self._record(track, 'failed', error=result.get('error'))
+
+        if self.library is not None:
+            if result['success']:
+                await asyncio.to_thread(self.library.mark, track,
+                                        'completed' if self.monitor is not None else 'enqueued')
+            elif self.monitor is not None and searched:
+                await asyncio.to_thread(self.library.mark, track, 'failed')
+        if self.coalescer is not None and not result.get('shared'):
+            self.coalescer.resolve(track, result, owner=self)
+        await results.put(result)
+        self._reported.add(id(track))
+
+    def _normalize(self, track: dict):
+        if not track or not track.get('title') or not track.get('artist'):
+            return None
+        track = dict(track)
+        track['title'] = ' '.join(str(track['title']).split())
+        track['artist'] = ' '.join(str(track['artist']).split())
+        return track
+
+    def _dedupe_key(self, track: dict):
+        if track.get('spotify_id'):
+            return track['spotify_id']
+        return (re.sub(r'\W+', ' ', track['artist'].lower()).strip(),
+                re.sub(r'\W+', ' ', track['title'].lower()).strip())
+
+
+async def _aiter(source):
+    if hasattr(source, '__aiter__'):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
@@ -1,65 +1,216 @@
-import json
-from clients.soulseek_client import SoulseekClient
-from clients.spotify_client import SpotifyClient
+from services.search_scheduler import SearchScheduler
+from services.pipeline import DownloadPipeline
+from services.search_cache import create_search_cache
+from services.library_index import LibraryIndex
+from services.job_journal import JobJournal, COMPLETED, ENQUEUED, journal_key
+from services.metrics import metrics
+from services.single_flight import SingleFlight
+from services.peer_reputation import PeerReputation
+from services.response_index import ResponseIndex
+from services.audio_verify import AudioVerifier
 from config import Config
 import asyncio
+import logging
+from contextlib import asynccontextmanager
+from functools import cached_property
+
+logger = logging.getLogger(__name__)
 
 
 class PlaylistDownloader:
+    """Les clients (spotipy, aiohttp, numpy/rapidfuzz pour le classement, worker node) ne sont créés,
+    et leurs modules importés, qu'au premier usage"""
+
     def __init__(self):
         Config.validate()
-        self.spotify = SpotifyClient()
-        self.soulseek = SoulseekClient()
-    
+        self.scheduler = SearchScheduler()
+        self.search_cache = create_search_cache()
+        self.reputation = PeerReputation()
+        self.response_index = ResponseIndex() if Config.RESPONSE_INDEX else None
+        # la vérification a besoin de l'issue réelle du transfert, donc du monitor
+        self.verifier = AudioVerifier() if Config.VERIFY_DOWNLOADS and Config.TRANSFER_MONITOR else None
+        self.library = LibraryIndex()
+        self.journal = JobJournal()
+        # partagé par tous les pipelines: une track présente dans plusieurs sources n'est cherchée qu'une fois
+        self.inflight = SingleFlight()
+
+    @cached_property
+    def spotify(self):
+        from clients.spotify_client import SpotifyClient
+        return SpotifyClient()
+
+    @cached_property
+    def bandcamp(self):
+        from clients.bandcamp_client import BandcampClient
+        return BandcampClient()
+
+    @cached_property
+    def soulseek(self):
+        from clients.soulseek_client import SoulseekClient
+        return SoulseekClient(scheduler=self.scheduler, search_cache=self.search_cache,
+                              reputation=self.reputation, response_index=self.response_index,
+                              verifier=self.verifier)
+
+    @cached_property
+    def monitor(self):
+        if not Config.TRANSFER_MONITOR:
+            return None
+        from services.transfer_monitor import TransferMonitor
+        return TransferMonitor(self.soulseek.api, reputation=self.reputation)
+
+    def _created(self, name: str) -> bool:
+        return name in self.__dict__
+
     async def extract_spotify_metadata(self, playlist_url: str): 
         tracks = await self.spotify.get_playlist_tracks(playlist_url)
         return tracks
 
+    def iter_spotify_tracks(self, playlist_url: str):
+        return self.spotify.iter_playlist_tracks(playlist_url)
+
+    async def spotify_snapshot_id(self, playlist_url: str) -> str:
+        return await self.spotify.get_snapshot_id(playlist_url)
 
     async def get_bandcamp_likes_metadata(self, cookie: str):
         try:
-            process = await asyncio.create_subprocess_exec(
-                'node', './bc-fetch.js', cookie,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                print(f"error while executing js script: {stderr.decode()}")
-                return None
-            
-            result_text = stdout.decode('utf-8').strip()
-            return json.loads(result_text)
-            
-        except FileNotFoundError:
-            print("error: node.js not installed or can't find bc-fetch.js")
-            return None
-        except json.JSONDecodeError as e:
-            print(f"json parsing error: {e}")
-            print(f"received output: {result_text}")
-            return None
+            return [track async for track in self.iter_bandcamp_likes(cookie)]
         except Exception as e:
             print(f"unexpected error: {e}")
             return None
-    
-    async def sem_task(self, track, semaphore):
-        async with semaphore:
-            await asyncio.sleep(1)
-            return await self.soulseek.search_and_download(track)
-            
-
-    async def download_playlist(self, track_list: list):
-        # fix parallel tasks limit 
-        semaphore = asyncio.Semaphore(2)
+
+    async def iter_bandcamp_likes(self, cookie: str):
+        async for album in self.iter_bandcamp_albums(cookie):
+            for track in album['tracks']:
+                yield track
+
+    async def iter_bandcamp_albums(self, cookie: str):
+        """Le worker bandcamp renvoie chaque album dès que sa tracklist est résolue (ou en cache)"""
+        try:
+            async for album in self.bandcamp.iter_wishlist(cookie):
+                album_tracks = album['tracks']
+                if album_tracks:
+                    yield {
+                        'artist': album_tracks[0]['artist'],
+                        'album': album_tracks[0].get('album', ''),
+                        'url': album['url'],
+                        'tracks': album_tracks
+                    }
+        except FileNotFoundError:
+            print(f"error: node.js not installed or can't find {Config.BANDCAMP_WORKER}")
+
+    async def stream_download(self, tracks, job_id: str = None, source: str = None):
+        """Télécharge depuis une liste ou un itérable async, les résultats sortent au fil de l'eau"""
+        if job_id is None:
+            job_id = self.journal.create_job(source)
+            print(f"📒 job id: {job_id} (resume with this id if the run is interrupted)")
+
+        pipeline = DownloadPipeline(
+            self.soulseek,
+            search_workers=Config.MAX_CONCURRENT_SEARCHES,
+            enqueue_workers=Config.MAX_CONCURRENT_DOWNLOADS,
+            queue_size=Config.PIPELINE_QUEUE_SIZE,
+            library=self.library,
+            monitor=self.monitor,
+            max_transfers=Config.MAX_ACTIVE_TRANSFERS,
+            journal=self.journal,
+            job_id=job_id,
+            coalescer=self.inflight
+        )
         try:
-            await self.soulseek.connect()
+            # le scan ne relit que les dossiers modifiés depuis la dernière synchro
+            await asyncio.to_thread(self.library.scan)
+
+            async with self.session():
+                async for result in pipeline.run(tracks):
+                    yield result
 
-            result = await asyncio.gather(*(self.sem_task(track, semaphore) for track in track_list))
-            return result
-            
         except Exception as e:
             print(f"download error: {e}")
             raise
+
         finally:
-            await self.soulseek.disconnect()
\ No newline at end of file
+            self.journal.flush()
+            self.report_metrics()
+
+    def report_metrics(self):
+        """Cumul depuis le lancement du process, toutes playlists confondues"""
+        if Config.METRICS_SUMMARY and metrics.histograms:
+            print(f"📊 stage timings:\n{metrics.summary_table()}")
+        if Config.METRICS_FILE:
+            try:
+                metrics.export(Config.METRICS_FILE)
+            except OSError as e:
+                logger.error(f"metrics export error: {e}")
+
+    @asynccontextmanager
+    async def session(self):
+        """Connexion slskd gardée ouverte d'une playlist à l'autre, fermée par close();
+        le health check n'est refait qu'une fois son TTL expiré"""
+        await self.soulseek.connect()
+        yield
+
+    async def resume(self, job_id: str):
+        """Reprend un job: les tracks terminées sont sautées, les transferts encore chez slskd sont suivis à nouveau"""
+        if not self.journal.job_exists(job_id):
+            raise ValueError(f"unknown job id: {job_id}")
+
+        journaled = self.journal.job_tracks(job_id)
+        # le journal ne contient que les tracks déjà passées par le pipeline: après un Ctrl-C en
+        # milieu de playlist, le reste n'est connu que de la source
+        source_tracks = await self._source_tracks(self.journal.job_source(job_id))
+        if source_tracks is None:
+            print("📒 source can't be re-read, only tracks already in the journal are resumed")
+            source_tracks = []
+        seen = {journal_key(track) for track, _, _ in journaled}
+        journaled += [(track, None, {}) for track in source_tracks if journal_key(track) not in seen]
+
+        pending = []
+        for track, state, data in journaled:
+            if state == COMPLETED:
+                yield {'success': True, 'skipped': True, 'track': track, 'message': 'completed in a previous run'}
+                continue
+            if state == ENQUEUED and self.monitor is not None:
+                track['_reattach'] = data
+            pending.append(track)
+
+        print(f"📒 resuming job {job_id}: {len(pending)} pending tracks")
+        async for result in self.stream_download(pending, job_id=job_id):
+            yield result
+
+    async def _source_tracks(self, source: str):
+        """Tracklist complète d'une source journalisée; None si elle n'est pas relisible (cookie bandcamp non stocké)"""
+        url = _spotify_url(source)
+        if url is None:
+            return None
+        try:
+            return [track async for track in self.iter_spotify_tracks(url)]
+        except Exception as e:
+            logger.warning(f"could not re-read {url}: {e}")
+            return None
+
+    async def close(self):
+        # rien à fermer pour un client jamais créé
+        if self._created('monitor') and self.monitor is not None:
+            await self.monitor.stop()
+        if self._created('soulseek'):
+            await self.soulseek.disconnect()
+        if self._created('bandcamp'):
+            await self.bandcamp.close()
+        if self.verifier is not None:
+            self.verifier.close()
+        await self.search_cache.close()
+        # le journal vide son dernier lot avant de fermer
+        for db in (self.journal, self.library, self.reputation):
+            db.close()
+
+    async def download_playlist(self, track_list):
+        """Résultats par track; avec le monitor, success = transfert réellement terminé"""
+        return [result async for result in self.stream_download(track_list)]
+
+
+def _spotify_url(source: str):
+    # "spotify <url>" (sync, serveur de jobs) ou l'url seule (mode interactif)
+    if not source:
+        return None
+    url = source[len('spotify '):] if source.startswith('spotify ') else source
+    return url if 'open.spotify.com' in url else None
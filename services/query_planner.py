@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from functools import lru_cache
+from config import Config
+from services.library_index import strip_version
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+SPACES = re.compile(r'\s+')
+VERSION_SUFFIX = re.compile(r'\b(feat|ft|featuring|remix|remastered|deluxe)\b.*', re.IGNORECASE)
+# "Title (Someone Remix)", "Title - Someone Remix", "Title [Someone Edit]"
+REMIX = re.compile(r'[(\[-]\s*([^()\[\]-]+?)\s+(remix|edit|rework|bootleg|dub|mix)\s*[)\]]?\s*$', re.IGNORECASE)
+ARTIST_SEPARATORS = re.compile(r'\s*(?:,|&|\band\b|\bx\b|\bfeat\.?|\bft\.?|\bfeaturing\b|\bwith\b|\bvs\.?)\s*',
+                               re.IGNORECASE)
+
+
+def remove_accents(text: str) -> str:
+    return ''.join(
+        c for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    )
+
+
+def _clean(text: str, accents: bool = False) -> str:
+    text = SPACES.sub(' ', PUNCTUATION.sub(' ', text)).strip()
+    return text if accents else remove_accents(text)
+
+
+@lru_cache(maxsize=4096)
+def artist_forms(artist: str) -> tuple:
+    """(artiste complet, artiste principal, artiste complet avec accents), mémoïsé par chaîne d'artiste"""
+    primary = ARTIST_SEPARATORS.split(artist, maxsplit=1)[0] or artist
+    return _clean(artist), _clean(primary), _clean(artist, accents=True)
+
+
+def _base_title(title: str, accents: bool = False) -> str:
+    return VERSION_SUFFIX.sub('', _clean(title, accents)).strip()
+
+
+def base_query(track: dict) -> str:
+    """Requête historique: ponctuation et accents retirés, titre coupé à feat/remix/remastered/deluxe"""
+    artist, _, _ = artist_forms(track['artist'])
+    return f"{artist} {_base_title(track['title'])}".strip()
+
+
+def plan_queries(track: dict, limit: int = None) -> list:
+    """Variantes de requête dans l'ordre de préférence, sans doublons"""
+    limit = limit or Config.SEARCH_QUERY_VARIANTS
+    artist, primary, accented_artist = artist_forms(track['artist'])
+    # sans la partie "(... Remix)" / "- Remastered" que la requête historique laisse à moitié
+    title = _base_title(strip_version(track['title']))
+
+    queries = [base_query(track)]
+    if primary != artist:
+        queries.append(f"{primary} {title}".strip())
+
+    remix = REMIX.search(track['title'])
+    if remix:
+        queries.append(f"{primary} {title} {_clean(remix.group(1))} {remix.group(2).lower()}".strip())
+
+    accented = f"{accented_artist} {_base_title(strip_version(track['title']), accents=True)}".strip()
+    queries.append(accented)
+
+    planned = []
+    for query in queries:
+        if query and query.lower() not in (q.lower() for q in planned):
+            planned.append(query)
+    return planned[:limit]
@@ -0,0 +1,199 @@
+import logging
+import os
+import re
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+from config import Config
+from services.library_index import strip_version
+
+logger = logging.getLogger(__name__)
+
+LOSSLESS_FORMATS = ('flac', 'wav', 'aiff', 'alac')
+BAD_KEYWORDS = ('karaoke', 'instrumental', 'cover', 'live', 'acapella', 'remix', 'edit')
+
+
+class CandidateRanker:
+    """Aplatit tous les fichiers de toutes les réponses en colonnes et les note en un seul passage"""
+
+    def __init__(self, max_candidates: int = None, min_match_score: float = None):
+        self.max_candidates = max_candidates or Config.MAX_CANDIDATES
+        self.min_match_score = min_match_score or Config.MIN_MATCH_SCORE
+        self.formats = tuple(f.strip().lower() for f in Config.AUDIO_FORMATS)
+
+    def rank(self, track: dict, responses: list) -> list:
+        table = self._flatten(responses)
+        if not table['filename']:
+            return []
+
+        scores, similarity = self._score(track, table)
+        keep = np.flatnonzero(similarity >= self.min_match_score)
+        if keep.size == 0:
+            return []
+
+        best = keep[np.argsort(-scores[keep], kind='stable')][:self.max_candidates]
+        return [self._candidate(table, int(i), float(scores[i])) for i in best]
+
+    def rank_album(self, album: dict, responses: list, min_coverage: float = None):
+        """Choisit le dossier d'un seul peer qui couvre le mieux la tracklist: {index de track: fichier}"""
+        min_coverage = min_coverage or Config.ALBUM_MIN_COVERAGE
+        tracks = album['tracks']
+        table = self._flatten(responses)
+        if not table['filename'] or not tracks:
+            return None
+
+        names = [_path_tail(f) for f in table['filename']]
+        titles = [strip_version(t['title']) for t in tracks]
+        # un seul cdist pour toutes les tracks contre tous les fichiers de tous les dossiers
+        matrix = process.cdist(titles, names, scorer=fuzz.partial_ratio,
+                               processor=utils.default_process, dtype=np.float32, workers=-1) / 100
+
+        folders = {}
+        for i, (username, filename) in enumerate(zip(table['username'], table['filename'])):
+            folders.setdefault((username, re.split(r'[\\/][^\\/]*$', filename)[0]), []).append(i)
+
+        extension = np.array(table['extension'])
+        bitrate = np.array(table['bitrate'], dtype=np.float32)
+        lossless = np.isin(extension, LOSSLESS_FORMATS)
+        quality = np.where(lossless, 1.0, np.clip(bitrate / Config.TARGET_BITRATE, 0, 1) * 0.95)
+
+        best = None
+        for (username, directory), columns in folders.items():
+            matches = self._assign(matrix[:, columns], columns)
+            coverage = len(matches) / len(tracks)
+            if coverage < min_coverage:
+                continue
+
+            first = columns[0]
+            peer = 0.5 * table['free_slot'][first] + 0.5 / (1 + table['queue_length'][first] / 10)
+            score = coverage + 0.2 * float(quality[list(matches.values())].mean()) + 0.1 * peer
+            if best is None or score > best['score']:
+                best = {
+                    'username': username,
+                    'directory': directory,
+                    'score': score,
+                    'coverage': coverage,
+                    'matches': {track: table['file'][column] for track, column in matches.items()},
+                }
+        return best
+
+    def _assign(self, scores, columns: list) -> dict:
+        """Affectation gloutonne track -> fichier, un fichier ne sert qu'une fois"""
+        matches = {}
+        used = set()
+        for track in np.argsort(-scores.max(axis=1), kind='stable'):
+            for column in np.argsort(-scores[track], kind='stable'):
+                if scores[track, column] < self.min_match_score:
+                    break
+                if column not in used:
+                    used.add(column)
+                    matches[int(track)] = columns[column]
+                    break
+        return matches
+
+    def _flatten(self, responses: list) -> dict:
+        table = {key: [] for key in ('username', 'file', 'filename', 'extension', 'size', 'bitrate',
+                                     'length', 'free_slot', 'queue_length', 'upload_speed')}
+
+        for response in responses:
+            username = response.get('username')
+            if not username:
+                continue
+            free_slot = bool(response.get('hasFreeUploadSlot'))
+            queue_length = response.get('queueLength') or 0
+            upload_speed = response.get('uploadSpeed') or 0
+
+            for file in response.get('files') or ():
+                filename = file.get('filename', '')
+                extension = (file.get('extension') or os.path.splitext(filename)[1].lstrip('.')).lower()
+                if extension not in self.formats:
+                    continue
+                bitrate = file.get('bitRate') or 0
+                if extension not in LOSSLESS_FORMATS and bitrate and bitrate < Config.MIN_BITRATE:
+                    continue
+
+                table['username'].append(username)
+                table['file'].append(file)
+                table['filename'].append(filename)
+                table['extension'].append(extension)
+                table['size'].append(file.get('size') or 0)
+                table['bitrate'].append(bitrate)
+                table['length'].append(file.get('length') or 0)
+                table['free_slot'].append(free_slot)
+                table['queue_length'].append(queue_length)
+                table['upload_speed'].append(upload_speed)
+
+        return table
+
+    def _score(self, track: dict, table: dict):
+        # "dossier/fichier" sans extension: l'artiste est souvent dans le nom du dossier
+        names = [_path_tail(f) for f in table['filename']]
+        title = strip_version(track['title'])
+        artist = track['artist'].split(',')[0]
+
+        matrix = process.cdist([title, artist], names, scorer=fuzz.partial_ratio,
+                               processor=utils.default_process, dtype=np.float32, workers=-1)
+        title_sim, artist_sim = matrix[0] / 100, matrix[1] / 100
+        similarity = 0.65 * title_sim + 0.35 * artist_sim
+
+        extension = np.array(table['extension'])
+        bitrate = np.array(table['bitrate'], dtype=np.float32)
+        size = np.array(table['size'], dtype=np.float64)
+        length = np.array(table['length'], dtype=np.float32)
+        lossless = np.isin(extension, LOSSLESS_FORMATS)
+
+        # format: lossless > mp3 320 > le reste, bitrate inconnu = pénalisé
+        quality = np.where(lossless, 1.0, np.clip(bitrate / Config.TARGET_BITRATE, 0, 1) * 0.95)
+        quality = np.where(~lossless & (bitrate == 0), 0.5, quality)
+
+        duration = self._duration_score(track, size, bitrate, length, lossless)
+
+        free_slot = np.array(table['free_slot'], dtype=np.float32)
+        queue_length = np.array(table['queue_length'], dtype=np.float32)
+        upload_speed = np.array(table['upload_speed'], dtype=np.float32)
+        peer = (0.5 * free_slot
+                + 0.3 * np.clip(np.log1p(upload_speed) / np.log1p(10_000_000), 0, 1)
+                + 0.2 / (1 + queue_length / 10))
+
+        unwanted = self._unwanted_keywords(track, names)
+
+        scores = (0.45 * similarity + 0.25 * quality + 0.15 * duration + 0.15 * peer) - 0.3 * unwanted
+        return scores, similarity
+
+    def _duration_score(self, track, size, bitrate, length, lossless):
+        expected = (track.get('duration_ms') or 0) / 1000
+        if not expected:
+            return np.full(size.shape, 0.5, dtype=np.float32)
+
+        # sans "length", on estime la durée depuis taille et bitrate (valable pour du CBR)
+        estimated = np.where(bitrate > 0, size * 8 / np.maximum(bitrate, 1) / 1000, 0)
+        actual = np.where(length > 0, length, estimated)
+        known = (actual > 0) & ((length > 0) | ~lossless)
+
+        diff = np.abs(actual - expected)
+        score = np.clip(1 - diff / (Config.DURATION_TOLERANCE * 3), 0, 1)
+        return np.where(known, score, 0.5).astype(np.float32)
+
+    def _unwanted_keywords(self, track: dict, names: list):
+        wanted = f"{track['title']} {track.get('album') or ''}".lower()
+        keywords = [k for k in BAD_KEYWORDS if k not in wanted]
+        if not keywords:
+            return np.zeros(len(names), dtype=np.float32)
+        pattern = re.compile(r'\b(' + '|'.join(keywords) + r')\b', re.IGNORECASE)
+        return np.fromiter((bool(pattern.search(n)) for n in names), dtype=np.float32, count=len(names))
+
+    def _candidate(self, table: dict, i: int, score: float) -> dict:
+        return {
+            'username': table['username'][i],
+            'files': [table['file'][i]],
+            'score': score,
+            'hasFreeUploadSlot': table['free_slot'][i],
+            'queueLength': table['queue_length'][i],
+            'uploadSpeed': table['upload_speed'][i],
+        }
+
+
+def _path_tail(filename: str) -> str:
+    parts = re.split(r'[\\/]', filename)
+    stem = os.path.splitext(parts[-1])[0]
+    return f"{parts[-2]} {stem}" if len(parts) > 1 else stem
+
@@ -0,0 +1,88 @@
+import logging
+import re
+import time
+from config import Config
+from services.library_index import normalize_text, strip_version
+
+logger = logging.getLogger(__name__)
+
+# tokens trop courants pour filtrer quoi que ce soit
+STOPWORDS = frozenset(('the', 'a', 'an', 'of', 'and', 'feat', 'ft', 'mp3', 'flac', 'music', 'la', 'le', 'de'))
+
+
+def _tokens(text: str) -> set:
+    return {token for token in normalize_text(text).split() if token not in STOPWORDS}
+
+
+class ResponseIndex:
+    """Index inversé de tous les fichiers vus dans les réponses de recherche du run:
+    les tracks suivantes d'un même dossier sont trouvées sans nouvelle recherche"""
+
+    def __init__(self, max_files: int = None, ttl: float = None):
+        self.max_files = max_files or Config.RESPONSE_INDEX_MAX_FILES
+        self.ttl = ttl or Config.RESPONSE_INDEX_TTL
+        self.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        # entrée: (username, fichier, stats du peer, tokens du chemin, vu à)
+        self.entries = []
+        self.postings = {}
+        self.seen = set()
+
+    def add(self, responses: list):
+        now = time.monotonic()
+        for response in responses:
+            username = response.get('username')
+            if not username:
+                continue
+            peer = {
+                'hasFreeUploadSlot': response.get('hasFreeUploadSlot'),
+                'queueLength': response.get('queueLength'),
+                'uploadSpeed': response.get('uploadSpeed'),
+            }
+            for file in response.get('files') or ():
+                filename = file.get('filename')
+                if not filename or (username, filename) in self.seen:
+                    continue
+                if len(self.entries) >= self.max_files:
+                    # simple et borné: on repart de zéro plutôt que de gérer une éviction fine
+                    logger.info("response index full (%d files), clearing", len(self.entries))
+                    self.clear()
+
+                # artiste / album / fichier: les trois derniers éléments du chemin
+                tokens = frozenset(_tokens(' '.join(re.split(r'[\\/]', filename)[-3:])))
+                entry_id = len(self.entries)
+                self.entries.append((username, file, peer, tokens, now))
+                self.seen.add((username, filename))
+                for token in tokens:
+                    self.postings.setdefault(token, []).append(entry_id)
+
+    def lookup(self, track: dict, limit: int = 200) -> list:
+        """Réponses (au format slskd) dont un fichier contient tous les mots du titre et un mot de l'artiste"""
+        title_tokens = _tokens(strip_version(track['title']))
+        artist_tokens = _tokens(track['artist'].split(',')[0])
+        if not title_tokens:
+            return []
+
+        postings = sorted((self.postings.get(token, ()) for token in title_tokens), key=len)
+        if not postings[0]:
+            return []
+
+        oldest = time.monotonic() - self.ttl
+        responses = {}
+        found = 0
+        for entry_id in postings[0]:
+            username, file, peer, tokens, seen_at = self.entries[entry_id]
+            if seen_at < oldest or not title_tokens <= tokens:
+                continue
+            if artist_tokens and not artist_tokens & tokens:
+                continue
+            response = responses.setdefault(username, {'username': username, 'files': [], **peer})
+            response['files'].append(file)
+            found += 1
+            if found >= limit:
+                break
+        return list(responses.values())
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySearchCache:
+    """LRU en mémoire, utilisé quand REDIS_URL n'est pas défini"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or Config.SEARCH_CACHE_SIZE
+        self._entries = OrderedDict()
+
+    async def get(self, query: str):
+        key = _cache_key(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, responses = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return responses
+
+    async def set(self, query: str, responses: list):
+        key = _cache_key(query)
+        self._entries[key] = (time.monotonic() + _ttl(responses), responses)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self):
+        self._entries.clear()
+
+
+class RedisSearchCache:
+    """from_url ne se connecte pas: un ping au premier usage décide entre redis et le LRU en mémoire"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url, socket_connect_timeout=Config.REDIS_TIMEOUT,
+                                    socket_timeout=Config.REDIS_TIMEOUT)
+        self.fallback = None
+        self._checked = False
+        self._check_lock = asyncio.Lock()
+
+    async def _available(self) -> bool:
+        if not self._checked:
+            async with self._check_lock:
+                if not self._checked:
+                    try:
+                        await self.redis.ping()
+                        logger.info("search cache: redis")
+                    except Exception as e:
+                        logger.warning(f"redis unavailable, falling back to in-memory cache: {e}")
+                        self.fallback = MemorySearchCache()
+                    self._checked = True
+        return self.fallback is None
+
+    async def get(self, query: str):
+        if not await self._available():
+            return await self.fallback.get(query)
+        try:
+            raw = await self.redis.get(_cache_key(query))
+        except Exception as e:
+            logger.warning(f"redis cache read error: {e}")
+            return None
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, query: str, responses: list):
+        if not await self._available():
+            await self.fallback.set(query, responses)
+            return
+        try:
+            await self.redis.set(_cache_key(query), json.dumps(responses, default=_to_json), ex=_ttl(responses))
+        except Exception as e:
+            logger.warning(f"redis cache write error: {e}")
+
+    async def close(self):
+        if self.fallback is not None:
+            await self.fallback.close()
+        await self.redis.aclose()
+
+
+def create_search_cache():
+    if Config.REDIS_URL:
+        try:
+            return RedisSearchCache(Config.REDIS_URL)
+        except Exception as e:
+            # url invalide ou module redis absent; la connexion elle-même est vérifiée au premier usage
+            logger.warning(f"redis unavailable, falling back to in-memory cache: {e}")
+
+    logger.info("search cache: in-memory lru")
+    return MemorySearchCache()
+
+
+def _cache_key(query: str) -> str:
+    # les réponses sont filtrées (format, bitrate) avant la mise en cache: changer ces réglages change la clé
+    return f"search:{_filters_tag()}:{query.lower()}"
+
+
+def _filters_tag() -> str:
+    formats = ','.join(sorted(f.strip().lower() for f in Config.AUDIO_FORMATS))
+    return hashlib.sha1(f"{formats}|{Config.MIN_BITRATE}".encode('utf-8')).hexdigest()[:8]
+
+
+def _to_json(record):
+    # réponses compactes (clients.search_records)
+    return record.to_dict()
+
+
+def _ttl(responses: list) -> int:
+    # les recherches vides expirent plus vite, le réseau bouge
+    return Config.SEARCH_CACHE_TTL if responses else Config.SEARCH_CACHE_MISS_TTL
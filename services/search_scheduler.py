@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SearchScheduler:
+    """Limite les recherches (concurrence adaptative AIMD + débit par minute) et les enqueues"""
+
+    OK = 'ok'
+    EMPTY = 'empty'
+    TIMEOUT = 'timeout'
+    ERROR = 'error'
+
+    def __init__(self,
+                 max_searches: int = None,
+                 min_searches: int = None,
+                 searches_per_minute: int = None,
+                 max_enqueues: int = None):
+        self.max_searches = max_searches or Config.MAX_CONCURRENT_SEARCHES
+        self.min_searches = min_searches or Config.MIN_CONCURRENT_SEARCHES
+        self.searches_per_minute = searches_per_minute or Config.SEARCHES_PER_MINUTE
+
+        # on démarre à l'ancienne largeur fixe (2) et on laisse l'AIMD ajuster
+        self.limit = float(min(self.max_searches, max(self.min_searches, 2)))
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._started = deque()
+        self._rate_lock = asyncio.Lock()
+        self._outcomes = deque(maxlen=Config.SCHEDULER_WINDOW)
+        self._enqueue_sem = asyncio.Semaphore(max_enqueues or Config.MAX_CONCURRENT_DOWNLOADS)
+
+    @asynccontextmanager
+    async def search_slot(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self._wait_for_rate()
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def enqueue_slot(self):
+        async with self._enqueue_sem:
+            yield
+
+    async def _wait_for_rate(self):
+        async with self._rate_lock:
+            while True:
+                now = time.monotonic()
+                while self._started and now - self._started[0] >= 60:
+                    self._started.popleft()
+                if len(self._started) < self.searches_per_minute:
+                    self._started.append(now)
+                    return
+                await asyncio.sleep(60 - (now - self._started[0]))
+
+    async def record(self, outcome: str, latency: float = 0.0):
+        """Ajuste la limite de concurrence selon le résultat d'une recherche"""
+        self._outcomes.append(outcome)
+        previous = int(self.limit)
+
+        if outcome in (self.TIMEOUT, self.ERROR):
+            self._decrease(f"search {outcome}")
+        elif self._suspicious_empty_rate():
+            self._decrease("too many empty searches")
+            self._outcomes.clear()
+        elif outcome == self.OK and latency < Config.SEARCH_SLOW_SECONDS:
+            # additive increase: +1 slot par "fenêtre" de recherches rapides
+            self.limit = min(self.max_searches, self.limit + 1 / self.limit)
+
+        if int(self.limit) != previous:
+            logger.info(f"search concurrency {previous} -> {int(self.limit)}")
+            async with self._cond:
+                self._cond.notify_all()
+
+    def _decrease(self, reason: str):
+        self.limit = max(self.min_searches, self.limit / 2)
+        logger.debug("search backoff (%s), limit now %.2f", reason, self.limit)
+
+    def _suspicious_empty_rate(self) -> bool:
+        if len(self._outcomes) < self._outcomes.maxlen:
+            return False
+        empty = sum(1 for o in self._outcomes if o == self.EMPTY)
+        return empty / len(self._outcomes) >= Config.SCHEDULER_MAX_EMPTY_RATE
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import re
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_keys(track: dict) -> list:
+    """spotify_id quand il existe (deux tracks spotify homonymes restent distinctes), sinon artiste/titre normalisés"""
+    if track.get('spotify_id'):
+        return [track['spotify_id']]
+    return [(re.sub(r'\W+', ' ', track['artist'].lower()).strip(),
+             re.sub(r'\W+', ' ', track['title'].lower()).strip())]
+
+
+def _same_duration(a: dict, b: dict) -> bool:
+    if not a.get('duration_ms') or not b.get('duration_ms'):
+        return True
+    return abs(a['duration_ms'] - b['duration_ms']) / 1000 <= Config.DURATION_TOLERANCE
+
+
+class _Flight:
+    __slots__ = ('track', 'owner', 'future', 'keys')
+
+    def __init__(self, track, owner, future, keys):
+        self.track = track
+        self.owner = owner
+        self.future = future
+        self.keys = keys
+
+
+class SingleFlight:
+    """Une seule recherche/enqueue en vol par track, partagée entre toutes les playlists en cours;
+    les doublons attendent le résultat du premier"""
+
+    def __init__(self):
+        self._flights = {}
+
+    def __len__(self):
+        return len({id(flight) for flight in self._flights.values()})
+
+    def join(self, track: dict):
+        """Future du premier demandeur si la même track est déjà en vol, sinon None"""
+        for key in canonical_keys(track):
+            flight = self._flights.get(key)
+            if flight is not None and _same_duration(flight.track, track):
+                return flight.future
+        return None
+
+    def claim(self, track: dict, owner):
+        keys = [key for key in canonical_keys(track) if key not in self._flights]
+        flight = _Flight(track, owner, asyncio.get_running_loop().create_future(), keys)
+        for key in keys:
+            self._flights[key] = flight
+
+    def resolve(self, track: dict, result: dict, owner):
+        for key in canonical_keys(track):
+            flight = self._flights.get(key)
+            if flight is not None and flight.owner is owner:
+                self._release(flight)
+                if not flight.future.done():
+                    flight.future.set_result(result)
+                return
+
+    def abandon(self, owner):
+        """Le propriétaire s'arrête avant la fin: les doublons en attente sont débloqués"""
+        for flight in {id(f): f for f in self._flights.values() if f.owner is owner}.values():
+            self._release(flight)
+            flight.future.cancel()
+
+    def _release(self, flight: _Flight):
+        for key in flight.keys:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
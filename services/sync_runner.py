@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+import yaml
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def load_sources(path: str) -> dict:
+    """Fichier YAML ou JSON:
+
+    interval: 3600
+    sources:
+      - type: spotify
+        url: https://open.spotify.com/playlist/...
+      - type: bandcamp
+        cookie_env: BANDCAMP_COOKIE
+    """
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            config = json.load(f)
+        else:
+            config = yaml.safe_load(f) or {}
+
+    sources = config.get('sources') or []
+    for i, source in enumerate(sources):
+        if source.get('type') not in ('spotify', 'bandcamp'):
+            raise ValueError(f"source #{i}: unknown type {source.get('type')!r}")
+        if source['type'] == 'spotify' and not source.get('url'):
+            raise ValueError(f"source #{i}: spotify source needs a url")
+        if source['type'] == 'bandcamp':
+            if source.get('cookie_env'):
+                source['cookie'] = os.getenv(source['cookie_env'])
+            if not source.get('cookie'):
+                raise ValueError(f"source #{i}: bandcamp source needs a cookie or cookie_env")
+
+    return {'interval': config.get('interval', Config.SYNC_INTERVAL), 'sources': sources}
+
+
+class SyncState:
+    """Dernier snapshot_id synchronisé par playlist spotify"""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or Config.SYNC_STATE_FILE)
+        self.snapshots = {}
+        if self.path.exists():
+            self.snapshots = json.loads(self.path.read_text(encoding='utf-8')).get('snapshots', {})
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'snapshots': self.snapshots}, indent=2), encoding='utf-8')
+        tmp.replace(self.path)
+
+
+class SyncRunner:
+    """Synchro non interactive de plusieurs sources, une seule session slskd et un seul scheduler"""
+
+    def __init__(self, downloader, sources: list, interval: float = None, state: SyncState = None):
+        self.downloader = downloader
+        self.sources = sources
+        self.interval = interval or Config.SYNC_INTERVAL
+        self.state = state or SyncState()
+
+    async def run_once(self) -> dict:
+        started = time.monotonic()
+        async with self.downloader.session():
+            summaries = await asyncio.gather(
+                *(self._sync_source(source) for source in self.sources), return_exceptions=True
+            )
+
+        totals = {'sources': len(self.sources), 'tracks': 0, 'successful': 0, 'skipped': 0, 'unchanged': 0}
+        for source, summary in zip(self.sources, summaries):
+            if isinstance(summary, Exception):
+                logger.error(f"sync error for {_describe(source)}: {summary}")
+                continue
+            for key in ('tracks', 'successful', 'skipped', 'unchanged'):
+                totals[key] += summary[key]
+
+        logger.info(f"sync pass done in {time.monotonic() - started:.0f}s: {totals}")
+        return totals
+
+    async def watch(self):
+        # la session slskd reste ouverte entre deux passes
+        async with self.downloader.session():
+            while True:
+                await self.run_once()
+                logger.info(f"next sync in {self.interval:.0f}s")
+                await asyncio.sleep(self.interval)
+
+    async def _sync_source(self, source: dict) -> dict:
+        summary = {'tracks': 0, 'successful': 0, 'skipped': 0, 'unchanged': 0}
+
+        if source['type'] == 'spotify':
+            snapshot_id = await self.downloader.spotify_snapshot_id(source['url'])
+            if self.state.snapshots.get(source['url']) == snapshot_id:
+                logger.info(f"unchanged, skipped: {_describe(source)}")
+                summary['unchanged'] = 1
+                return summary
+            tracks = self.downloader.iter_spotify_tracks(source['url'])
+        elif Config.ALBUM_MODE:
+            tracks = self.downloader.iter_bandcamp_albums(source['cookie'])
+        else:
+            tracks = self.downloader.iter_bandcamp_likes(source['cookie'])
+
+        async for result in self.downloader.stream_download(tracks, source=_describe(source)):
+            summary['tracks'] += 1
+            summary['successful'] += result['success']
+            summary['skipped'] += bool(result.get('skipped'))
+
+        logger.info(f"{_describe(source)}: {summary['successful']}/{summary['tracks']} tracks")
+
+        # snapshot retenu seulement si toutes les tracks ont abouti (les skipped comptent comme successful),
+        # sinon la passe suivante retente la playlist
+        if source['type'] == 'spotify' and summary['successful'] == summary['tracks']:
+            self.state.snapshots[source['url']] = snapshot_id
+            self.state.save()
+        return summary
+
+
+def _describe(source: dict) -> str:
+    if source['type'] == 'spotify':
+        return f"spotify {source['url']}"
+    return source.get('name') or 'bandcamp likes'
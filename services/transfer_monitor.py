@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FAILED_STATES = ('Rejected', 'Errored', 'Cancelled', 'TimedOut', 'Failed', 'Aborted')
+QUEUED_STATES = ('Requested', 'Queued')
+
+
+class TransferMonitor:
+    """Suit les transferts slskd avec un seul appel groupé par intervalle"""
+
+    def __init__(self, api, poll_interval: float = None, stall_timeout: float = None,
+                 queue_timeout: float = None, missing_polls: int = 3, reputation=None):
+        self.api = api
+        self.reputation = reputation
+        self.poll_interval = poll_interval or Config.TRANSFER_POLL_INTERVAL
+        self.stall_timeout = stall_timeout or Config.TRANSFER_STALL_TIMEOUT
+        self.queue_timeout = queue_timeout or Config.TRANSFER_QUEUE_TIMEOUT
+        self.missing_polls = missing_polls
+        self._watched = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for watch in self._watched.values():
+            self._resolve(watch, self._outcome(watch, False, 'monitor stopped'))
+        self._watched.clear()
+
+    def watch(self, username: str, filename: str) -> asyncio.Future:
+        """Future résolue avec l'issue du transfert (succès, échec, ou bloqué puis annulé).
+        Protégée par shield: un job annulé n'annule pas la future partagée avec un autre job"""
+        key = (username, filename)
+        if key in self._watched and not self._watched[key]['future'].done():
+            return asyncio.shield(self._watched[key]['future'])
+
+        now = time.monotonic()
+        self._watched[key] = {
+            'future': asyncio.get_running_loop().create_future(),
+            'username': username,
+            'filename': filename,
+            'transfer': None,
+            'bytes': 0,
+            'enqueued_at': now,
+            'progress_at': now,
+            'started_at': None,
+            'missing': 0,
+        }
+        self.start()
+        return asyncio.shield(self._watched[key]['future'])
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._watched:
+                continue
+            try:
+                transfers = self._index(await self.api.get_all_downloads())
+            except Exception as e:
+                logger.warning(f"transfer poll error: {e}")
+                continue
+
+            for key, watch in list(self._watched.items()):
+                if not watch['future'].done():
+                    # une erreur sur un transfert ne doit pas arrêter le suivi de tous les autres
+                    try:
+                        await self._update(watch, transfers.get(key))
+                    except Exception as e:
+                        logger.warning(f"transfer update error for {watch['username']} / {watch['filename']}: {e}")
+                if watch['future'].done() and self._watched.get(key) is watch:
+                    del self._watched[key]
+
+    def _index(self, downloads: list) -> dict:
+        transfers = {}
+        for user in downloads or ():
+            for directory in user.get('directories') or ():
+                for transfer in directory.get('files') or ():
+                    transfers[(transfer.get('username') or user.get('username'), transfer['filename'])] = transfer
+        return transfers
+
+    async def _update(self, watch: dict, transfer: dict):
+        now = time.monotonic()
+
+        if transfer is None:
+            watch['missing'] += 1
+            if watch['missing'] >= self.missing_polls:
+                self._resolve(watch, self._outcome(watch, False, 'transfer not found in slskd'))
+            return
+
+        watch['missing'] = 0
+        watch['transfer'] = transfer
+        state = transfer.get('state', '')
+        transferred = transfer.get('bytesTransferred') or 0
+
+        if transferred > watch['bytes']:
+            watch['bytes'] = transferred
+            watch['progress_at'] = now
+
+        queued = any(queued in state for queued in QUEUED_STATES)
+        if not queued and watch['started_at'] is None:
+            # le délai de stall part du début réel du transfert, pas de l'enqueue
+            watch['started_at'] = now
+            watch['progress_at'] = now
+
+        if 'Succeeded' in state:
+            watch['bytes'] = transfer.get('size') or transferred
+            self._finish(watch, True, state)
+        elif any(failed in state for failed in FAILED_STATES):
+            self._finish(watch, False, state)
+        elif queued:
+            if now - watch['enqueued_at'] > self.queue_timeout:
+                await self._cancel(watch, f"queued for more than {self.queue_timeout:.0f}s")
+        elif now - watch['progress_at'] > self.stall_timeout:
+            await self._cancel(watch, f"stalled for more than {self.stall_timeout:.0f}s")
+
+    async def _cancel(self, watch: dict, reason: str):
+        logger.info("cancelling %s / %s: %s", watch['username'], watch['filename'], reason)
+        try:
+            await self.api.cancel_download(watch['username'], watch['transfer']['id'])
+        except Exception as e:
+            logger.warning(f"cancel error: {e}")
+        self._finish(watch, False, reason)
+
+    def _finish(self, watch: dict, success: bool, state: str):
+        outcome = self._outcome(watch, success, state)
+        if self.reputation is not None:
+            self.reputation.record_transfer(outcome)
+        self._resolve(watch, outcome)
+
+    def _resolve(self, watch: dict, outcome: dict):
+        if not watch['future'].done():
+            watch['future'].set_result(outcome)
+
+    def _outcome(self, watch: dict, success: bool, state: str) -> dict:
+        transfer = watch['transfer'] or {}
+        return {
+            'success': success,
+            'state': state,
+            'id': transfer.get('id'),
+            'username': watch['username'],
+            'filename': watch['filename'],
+            'bytes': watch['bytes'] if success else 0,
+            'elapsed': time.monotonic() - watch['enqueued_at'],
+            'queue_seconds': (watch['started_at'] or time.monotonic()) - watch['enqueued_at'],
+        }